@@ -0,0 +1,53 @@
+"""notification timestamps
+
+Revision ID: 5d7e9a1c3f42
+Revises: 8f1d2c4a7b90
+Create Date: 2026-10-18 11:02:17.530214
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5d7e9a1c3f42"
+down_revision: Union[str, None] = "8f1d2c4a7b90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the columns used to hold strings like "Oct 17 2026 03:04:05 PM" in Asia/Kathmandu
+columns = ["created_at", "read_at"]
+old_format = "Mon DD YYYY HH12:MI:SS AM"
+old_timezone = "Asia/Kathmandu"
+
+
+def upgrade() -> None:
+    for column in columns:
+        op.alter_column(
+            "notifications",
+            column,
+            type_=sa.DateTime(timezone=True),
+            existing_type=sa.String(),
+            existing_nullable=column == "read_at",
+            postgresql_using=(
+                f"(to_timestamp({column}, '{old_format}')::timestamp)"
+                f" AT TIME ZONE '{old_timezone}'"
+            ),
+        )
+
+
+def downgrade() -> None:
+    for column in columns:
+        op.alter_column(
+            "notifications",
+            column,
+            type_=sa.String(),
+            existing_type=sa.DateTime(timezone=True),
+            existing_nullable=column == "read_at",
+            postgresql_using=(
+                f"to_char({column} AT TIME ZONE '{old_timezone}', '{old_format}')"
+            ),
+        )
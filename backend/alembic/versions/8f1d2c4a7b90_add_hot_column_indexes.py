@@ -0,0 +1,49 @@
+"""add hot column indexes
+
+Revision ID: 8f1d2c4a7b90
+Revises: 3c5b0529dc81
+Create Date: 2026-10-18 10:12:41.204518
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8f1d2c4a7b90"
+down_revision: Union[str, None] = "3c5b0529dc81"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+indexes = [
+    ("ix_users_uid", "users", ["uid"]),
+    ("ix_notifications_receiver_id", "notifications", ["receiver_id"]),
+    ("ix_Friend_user_id_friend_user_id", "Friend", ["user_id", "friend_user_id"]),
+    ("ix_Friend_friend_user_id", "Friend", ["friend_user_id"]),
+    (
+        "ix_BlockedUser_user_id_blocked_user_id",
+        "BlockedUser",
+        ["user_id", "blocked_user_id"],
+    ),
+    ("ix_BlockedUser_blocked_user_id", "BlockedUser", ["blocked_user_id"]),
+    (
+        "ix_RequestedUser_user_id_requested_user_id",
+        "RequestedUser",
+        ["user_id", "requested_user_id"],
+    ),
+    ("ix_RequestedUser_requested_user_id", "RequestedUser", ["requested_user_id"]),
+]
+
+
+def upgrade() -> None:
+    # the app may already have created them at startup
+    for name, table, columns in indexes:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(indexes):
+        op.drop_index(name, table_name=table, if_exists=True)
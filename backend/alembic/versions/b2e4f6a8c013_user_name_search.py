@@ -0,0 +1,47 @@
+"""user name search
+
+Revision ID: b2e4f6a8c013
+Revises: 5d7e9a1c3f42
+Create Date: 2026-10-18 14:26:53.118402
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b2e4f6a8c013"
+down_revision: Union[str, None] = "5d7e9a1c3f42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "users",
+        sa.Column(
+            "full_name",
+            sa.String(),
+            sa.Computed("first_name || ' ' || last_name", persisted=True),
+            nullable=False,
+        ),
+    )
+    # the startup bootstrap skips it until the column and extension above exist
+    op.create_index(
+        "ix_users_full_name_trgm",
+        "users",
+        ["full_name"],
+        unique=False,
+        if_not_exists=True,
+        postgresql_using="gin",
+        postgresql_ops={"full_name": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_full_name_trgm", table_name="users", if_exists=True)
+    op.drop_column("users", "full_name")
@@ -4,7 +4,16 @@ from app.api.v1.handlers.exceptions import (
     TokenExpiredException,
     AuthException,
     AdminRequiredException,
+    TooManyRequestsException,
 )
+from app.services.ratelimit import RateLimiter, take
+
+
+def public(func):
+    # goes below the route decorator, the auth middleware passes these routes through
+    # with an anonymous user without looking at the request
+    func.is_public = True
+    return func
 
 
 def require_authentication(is_superuser: bool = False):
@@ -30,3 +39,23 @@ def require_authentication(is_superuser: bool = False):
         return wrapper_fun
 
     return decorator
+
+
+def rate_limit(limiter: RateLimiter):
+    # goes below require_authentication, buckets are keyed by the user id
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper_fun(*args, **kwargs):
+            request = kwargs.get("request")
+            if not request:
+                raise Exception("requires request parameter in routes for rate limit")
+
+            retry_after = take([(limiter, limiter.bucket(request.user.id))])
+            if retry_after:
+                raise TooManyRequestsException(retry_after)
+
+            return await func(*args, **kwargs)
+
+        return wrapper_fun
+
+    return decorator
@@ -1,15 +1,31 @@
 from bson import ObjectId
 from bson.errors import InvalidId
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, HTTPException, Query
 from app.api.permission import require_authentication
+from app.api.v1.schemas.message import MessagePage
 from app.db.mango.dependency import mangodb_dependency
 from app.db.mango.models.message import Message
-from app.db.mango.models.room import Room
+from app.services.room_cache import room_cache
+from app.utils.cursor import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/message", tags=["messages"])
 
 
-@router.get("/msg/{room_id}/")
+async def check_room_member(room_id: str, user_id: int):
+    try:
+        ObjectId(room_id)
+    except InvalidId:
+        raise HTTPException(detail="invalid room id", status_code=403)
+
+    room = await room_cache.get(room_id)
+    if not room:
+        raise HTTPException(detail="Cannot find room", status_code=403)
+
+    if user_id not in room.members:
+        raise HTTPException(detail="user not in room", status_code=403)
+
+
+@router.get("/msg/{room_id}/", deprecated=True)
 @require_authentication()
 async def get_room_messages(
     mango: mangodb_dependency,
@@ -18,17 +34,8 @@ async def get_room_messages(
     offset: int,
     limit: int,
 ):
-
-    try:
-        room_object_id = ObjectId(room_id)
-        room = await mango.find_one(Room, {"_id": room_object_id})
-        if not room:
-            raise HTTPException(detail="Cannot find room", status_code=403)
-    except InvalidId:
-        raise HTTPException(detail="invalid room id", status_code=403)
-
-    if request.user.id not in [usr.user_id for usr in room.users]:
-        raise HTTPException(detail="user not in room", status_code=403)
+    """Offset pagination, kept for old clients. Use /message/history/ instead."""
+    await check_room_member(room_id, request.user.id)
 
     messages = await mango.find(
         Message,
@@ -39,3 +46,46 @@ async def get_room_messages(
     )
     messages.reverse()
     return messages
+
+
+@router.get("/history/{room_id}/", response_model=MessagePage)
+@require_authentication()
+async def get_room_history(
+    mango: mangodb_dependency,
+    request: Request,
+    room_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    before: str | None = None,
+    after: str | None = None,
+):
+    """
+    Keyset pagination of the room messages, oldest first within a page. Without a
+    cursor it returns the latest messages, ``before`` pages back through older ones
+    and ``after`` forward through newer ones. ``next_cursor`` continues in the same
+    direction and is null once there is nothing left.
+    """
+    if before and after:
+        raise HTTPException(detail="use either before or after", status_code=400)
+    await check_room_member(room_id, request.user.id)
+
+    cursor = before or after
+    query: dict = {"room_id": room_id}
+    if cursor:
+        cursor_id = decode_cursor(cursor)
+        if cursor_id is None:
+            raise HTTPException(detail="invalid cursor", status_code=400)
+        query["_id"] = {"$gt" if after else "$lt": cursor_id}
+
+    messages = await mango.find(
+        Message,
+        query,
+        limit=limit + 1,
+        sort=Message.id.asc() if after else Message.id.desc(),
+    )
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    next_cursor = encode_cursor(messages[-1].id) if has_more else None
+    if not after:
+        messages.reverse()
+
+    return MessagePage(messages=messages, next_cursor=next_cursor)
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Request
+
+from app.api.permission import require_authentication
+from app.middlewares.auth import token_cache
+from app.services.message import message_pipeline
+from app.services.password import password_stats
+from app.services.ratelimit import ratelimit_stats
+from app.services.refresh_token import revoked_refresh_tokens
+from app.services.websocket.connections import main_connections, room_connections
+from app.services.websocket.heartbeat import heartbeat_stats
+from app.services.websocket.outbox import outbox_stats
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/")
+@require_authentication(is_superuser=True)
+async def get_metrics(request: Request):
+    return {
+        "connections": {
+            "users": len(main_connections),
+            "rooms": len(room_connections),
+        },
+        "outbox": outbox_stats,
+        "heartbeat": heartbeat_stats,
+        "ratelimit": ratelimit_stats,
+        "token_cache": {**token_cache.stats, "size": len(token_cache.entries)},
+        "revoked_refresh_tokens": revoked_refresh_tokens.count,
+        "password": password_stats,
+        "message_pipeline": {
+            **message_pipeline.stats,
+            "queue_depth": message_pipeline.queue_depth,
+            "inbox_depth": message_pipeline.inbox_depth,
+        },
+    }
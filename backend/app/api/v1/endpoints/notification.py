@@ -3,6 +3,7 @@ from fastapi import APIRouter, Request, HTTPException
 from app.api.permission import require_authentication
 from app.db.postgres.dependency import postgres_dependency
 from app.extra.query import NotificationQuery
+from app.utils.date import utc_now
 from app.api.v1.schemas.notification import (
     NotificationModel,
     NotificationPatchModel,
@@ -17,7 +18,7 @@ async def get_notification(
     request: Request, db: postgres_dependency, limit: int = 10, offset: int = 0
 ):
     results = await NotificationQuery.get_all_by_reciever_id(
-        db, request.user.id, True, limit, offset, ("id", "desc")
+        db, request.user.id, "full", limit, offset, ("id", "desc")
     )
 
     return results
@@ -39,6 +40,7 @@ async def mark_as_read_or_change_active_status(
 
     if data.is_read is not None:
         notification.is_read = data.is_read
+        notification.read_at = utc_now() if data.is_read else None
     if data.is_active is not None:
         notification.extra_data.update({"is_active": data.is_active})
     await db.commit()
@@ -55,8 +57,10 @@ async def mark_all_as_read(request: Request, db: postgres_dependency):
 
     if not notifications:
         raise HTTPException(status_code=404, detail="notification not found")
+    read_at = utc_now()
     for notification in notifications:
         notification.is_read = True
+        notification.read_at = read_at
     await db.commit()
     return {"msg": "all notification marked as read"}
 
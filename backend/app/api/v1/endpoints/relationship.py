@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request, HTTPException
 
-from app.api.permission import require_authentication
+from app.api.permission import require_authentication, rate_limit
 from app.db.postgres.dependency import postgres_dependency
 from app.db.mango.dependency import mangodb_dependency
 from app.db.postgres.models.notification import (
@@ -9,41 +9,50 @@ from app.db.postgres.models.notification import (
     json_data_friend_request,
 )
 from app.services.notification import send_notification_to_user
-from app.extra.query import UserQuery, NotificationQuery
-from app.services.websocket.connections import room_connections
-from app.services.user import (
-    get_user_for_add,
+from app.extra.query import NotificationQuery
+from app.services.websocket.dispatch import publish_room_close
+from app.services.relationship import (
+    Relation,
+    get_users_with_relation,
+    add_friend,
+    remove_friend,
+    add_request,
+    remove_request,
+    add_block,
+    remove_block,
 )
 from app.services.room import create_room, change_room_status
+from app.services.ratelimit import relationship_limiter
 
 router = APIRouter(prefix="/relation", tags=["relationship"])
 
 
 @router.get("/accept/{user_id}/")
 @require_authentication()
+@rate_limit(relationship_limiter)
 async def accept_friend_request(
     request: Request, db: postgres_dependency, mango: mangodb_dependency, user_id: int
 ):
-    main_user, second_user, is_already_friend = await get_user_for_add(
-        db, main_user_id=request.user.id, second_user_id=user_id, operation="friend"
+    main_user, second_user, relation = await get_users_with_relation(
+        db, request.user.id, user_id
     )
 
-    if is_already_friend:
+    if Relation.FRIEND in relation:
         raise HTTPException(
             detail="user is already in your friend list", status_code=403
         )
 
-    if second_user in main_user.blocked_user:
+    if Relation.BLOCKED in relation:
         raise HTTPException(
             detail="unblock this user to add to friend list",
             status_code=403,
         )
 
-    if second_user not in main_user.requested_by:
+    if Relation.REQUESTED_BY not in relation:
         raise HTTPException(detail="request this user to add friend", status_code=403)
 
-    main_user.requested_by.remove(second_user)
-    main_user.friend.append(second_user)
+    await remove_request(db, second_user.id, main_user.id)
+    await add_friend(db, main_user.id, second_user.id)
 
     request_notification = await NotificationQuery(
         db,
@@ -85,32 +94,30 @@ async def accept_friend_request(
 
 @router.get("/request/{user_id}/")
 @require_authentication()
+@rate_limit(relationship_limiter)
 async def request_user_for_friend(
     request: Request, db: postgres_dependency, user_id: int
 ):
-    main_user, second_user, is_already_requested = await get_user_for_add(
-        db,
-        main_user_id=request.user.id,
-        second_user_id=user_id,
-        operation="requested_user",
+    main_user, second_user, relation = await get_users_with_relation(
+        db, request.user.id, user_id
     )
 
-    if is_already_requested:
+    if Relation.REQUESTED in relation:
         return main_user
 
-    if second_user in main_user.blocked_user:
+    if Relation.BLOCKED in relation:
         raise HTTPException(
             detail="unblock this user to request this user",
             status_code=403,
         )
 
-    if second_user in main_user.friend:
+    if Relation.FRIEND in relation:
         raise HTTPException(
             detail="user is already in your friend list",
             status_code=403,
         )
 
-    main_user.requested_user.append(second_user)
+    await add_request(db, main_user.id, second_user.id)
 
     request_notification = Notification(
         sender_id=main_user.id,
@@ -131,16 +138,18 @@ async def request_user_for_friend(
 
 @router.get("/cancelrequest/{user_id}/")
 @require_authentication()
+@rate_limit(relationship_limiter)
 async def cancel_request(request: Request, db: postgres_dependency, user_id: int):
-    main_user = await UserQuery.one(db, request.user.id)
-    second_user = await UserQuery.one(db, user_id, False)
+    main_user, second_user, relation = await get_users_with_relation(
+        db, request.user.id, user_id
+    )
 
-    if second_user not in main_user.requested_user:
+    if Relation.REQUESTED not in relation:
         raise HTTPException(
             detail="user is not in your requested list", status_code=403
         )
 
-    main_user.requested_user.remove(second_user)
+    await remove_request(db, main_user.id, second_user.id)
 
     request_notification = await NotificationQuery(
         db,
@@ -179,22 +188,18 @@ async def cancel_request(request: Request, db: postgres_dependency, user_id: int
 
 @router.get("/unfriend/{user_id}/")
 @require_authentication()
+@rate_limit(relationship_limiter)
 async def unfriend_user(
     request: Request, db: postgres_dependency, mangodb: mangodb_dependency, user_id: int
 ):
-    main_user, second_user, is_not_friend = await get_user_for_add(
-        db, main_user_id=request.user.id, second_user_id=user_id, operation="unfriend"
+    main_user, second_user, relation = await get_users_with_relation(
+        db, request.user.id, user_id
     )
 
-    if is_not_friend:
+    if Relation.FRIEND not in relation:
         raise HTTPException(detail="user is not in your friend list", status_code=403)
 
-    if second_user in main_user.friend:
-        main_user.friend.remove(second_user)
-    elif second_user in main_user.friend_by:
-        main_user.friend_by.remove(second_user)
-    else:
-        return main_user
+    await remove_friend(db, main_user.id, second_user.id)
 
     unfriend_notificaiton = Notification(
         sender_id=main_user.id,
@@ -210,28 +215,25 @@ async def unfriend_user(
     # close the room if connected and deactivate the room
     room = await change_room_status(mangodb, main_user.id, second_user.id, False)
     if room:
-        if str(room.id) in room_connections:
-            await room_connections[str(room.id)].close_room()
+        await publish_room_close(str(room.id))
 
     return main_user
 
 
 @router.get("/block/{user_id}/")
 @require_authentication()
+@rate_limit(relationship_limiter)
 async def block_user(
     request: Request, db: postgres_dependency, mangodb: mangodb_dependency, user_id: int
 ):
-    main_user, second_user, is_already_blocked = await get_user_for_add(
-        db,
-        main_user_id=request.user.id,
-        second_user_id=user_id,
-        operation="blocked_user",
+    main_user, second_user, relation = await get_users_with_relation(
+        db, request.user.id, user_id
     )
 
-    if is_already_blocked:
+    if Relation.BLOCKED in relation:
         return main_user
 
-    main_user.blocked_user.append(second_user)
+    await add_block(db, main_user.id, second_user.id)
 
     block_notification = Notification(
         sender_id=main_user.id,
@@ -249,25 +251,25 @@ async def block_user(
     # close the room if connected and deactivate the room
     room = await change_room_status(mangodb, main_user.id, second_user.id, False)
     if room:
-        if str(room.id) in room_connections:
-            print("closed room: ", room.id)
-            await room_connections[str(room.id)].close_room()
+        await publish_room_close(str(room.id))
 
     return main_user
 
 
 @router.get("/unblock/{user_id}/")
 @require_authentication()
+@rate_limit(relationship_limiter)
 async def unblock_user(
     request: Request, db: postgres_dependency, mangodb: mangodb_dependency, user_id: int
 ):
-    main_user = await UserQuery.one(db, request.user.id)
-    second_user = await UserQuery.one(db, user_id, False)
+    main_user, second_user, relation = await get_users_with_relation(
+        db, request.user.id, user_id
+    )
 
-    if second_user not in main_user.blocked_user:
+    if Relation.BLOCKED not in relation:
         raise HTTPException(detail="user is not in your blocked list", status_code=403)
 
-    main_user.blocked_user.remove(second_user)
+    await remove_block(db, main_user.id, second_user.id)
     unblock_notification = Notification(
         sender_id=main_user.id,
         receiver_id=second_user.id,
@@ -280,8 +282,7 @@ async def unblock_user(
 
     await send_notification_to_user(unblock_notification, main_user)
 
-    if second_user in main_user.friend or second_user in main_user.friend_by:
-        if second_user not in main_user.blocked_by:
-            await change_room_status(mangodb, main_user.id, second_user.id, True)
+    if Relation.FRIEND in relation and Relation.BLOCKED_BY not in relation:
+        await change_room_status(mangodb, main_user.id, second_user.id, True)
 
     return main_user
@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Request, HTTPException
+from datetime import datetime
+
+from fastapi import APIRouter, Request, Response, HTTPException, Query
 from app.db.postgres.dependency import postgres_dependency
 from app.db.mango.dependency import mangodb_dependency
 from app.api.permission import require_authentication
 from app.db.mango.models.room import Room
 from app.db.mango.models.message import Message
-from sqlalchemy import select
-from app.db.postgres.models.user import User
+from app.extra.query import UserQuery
 from app.api.v1.schemas.message import ChatHistoryResponse
 from app.api.v1.schemas.user import UserModel
 from bson import ObjectId
 from bson.errors import InvalidId
-from app.utils.date import datetime_format
-from datetime import datetime
+from app.services.room_cache import room_cache
+from app.services.room import sync_room_cache
+from app.services.inbox import get_inbox
+from app.utils.cursor import decode_keyset, encode_keyset
 
 
 router = APIRouter(prefix="/room", tags=["room"])
@@ -28,63 +31,70 @@ async def get_rooms(request: Request, mango: mangodb_dependency):
 @require_authentication()
 async def get_chat_history(
     request: Request,
+    response: Response,
     mangodb: mangodb_dependency,
     db: postgres_dependency,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: str | None = None,
 ):
-    rooms = await mangodb.find(Room, {"users.user_id": {"$eq": request.user.id}})
-    history_user_id = []
-    history_user_room = []
-    for room in rooms:
-        room_data = {"room": room, "users": []}
-        for usr in room.users:
-            if usr.user_id != request.user.id:
-                history_user_id.append(usr.user_id)
-                room_data["users"].append(usr.user_id)
-        history_user_room.append(room_data)
-
-    history_user_query = select(User).filter(User.id.in_(history_user_id))
-    history_user = (await db.scalars(history_user_query)).unique().all()
+    """The next page is requested with the cursor sent back in X-Next-Cursor"""
+    after = None
+    if cursor:
+        try:
+            last_activity, entry_id = decode_keyset(cursor)
+            after = (datetime.fromisoformat(last_activity), ObjectId(entry_id))
+        except (TypeError, ValueError, InvalidId):
+            raise HTTPException(detail="invalid cursor", status_code=400)
+
+    # inbox entries come most recent first, everything else is fetched by id
+    inbox = await get_inbox(request.user.id, limit + 1, after)
+    if len(inbox) > limit:
+        inbox = inbox[:limit]
+        last = inbox[-1]
+        response.headers["X-Next-Cursor"] = encode_keyset(
+            [last.last_activity.isoformat(), str(last.id)]
+        )
 
-    results = []
+    room_ids = [ObjectId(entry.room_id) for entry in inbox]
+    rooms = {
+        str(room.id): room
+        for room in await mangodb.find(Room, {"_id": {"$in": room_ids}})
+    }
+    message_ids = [entry.last_message_id for entry in inbox if entry.last_message_id]
+    messages = {
+        msg.id: msg
+        for msg in await mangodb.find(Message, {"_id": {"$in": message_ids}})
+    }
+
+    history_user_id = {
+        usr.user_id
+        for room in rooms.values()
+        for usr in room.users
+        if usr.user_id != request.user.id
+    }
+    history_user = {
+        usr.id: usr for usr in await UserQuery.many(db, history_user_id, "identity")
+    }
 
-    for room in history_user_room:
-        messages = await mangodb.find(
-            Message,
-            {"room_id": str(room["room"].id)},
-            limit=5,
-            sort=Message.id.desc(),
-        )
-        unseen_msg_quantity = 0
-        for msg in messages:
-            if msg.status != "seen" and msg.sender_id != request.user.id:
-                unseen_msg_quantity += 1
-
-        msg = messages[0] if messages else None
-
-        result = ChatHistoryResponse(
-            room=room["room"],
-            users=[],
-            message=msg,
-            quantity=unseen_msg_quantity,
+    results = []
+    for entry in inbox:
+        room = rooms.get(entry.room_id)
+        if room is None:
+            continue
+        results.append(
+            ChatHistoryResponse(
+                room=room,
+                users=[
+                    UserModel(**history_user[usr.user_id].__dict__)
+                    for usr in room.users
+                    if usr.user_id in history_user
+                ],
+                message=messages.get(entry.last_message_id),
+                quantity=entry.unread,
+            )
         )
-        for room_usr in room["users"]:
-            for usr in history_user:
-                if usr.id == room_usr:
-                    result.users.append(UserModel(**usr.__dict__))
-                    break
-        results.append(result)
-
-    sorted_results = sorted(
-        results,
-        key=lambda chat_object: (
-            datetime.strptime(chat_object.message.created_at, datetime_format)
-            if chat_object.message is not None
-            else datetime.strptime(chat_object.room.created_at, datetime_format)
-        ),
-        reverse=True,
-    )
 
-    return sorted_results
+    return results
 
 
 @router.get("/initialRoom/")
@@ -98,13 +108,19 @@ async def get_initial_room(request: Request, mango: mangodb_dependency):
 
 @router.get("/room/{room_id}/")
 @require_authentication()
-async def get_room_by_id(request: Request, room_id: str, mango: mangodb_dependency):
+async def get_room_by_id(request: Request, room_id: str):
     try:
-        room = await mango.find_one(Room, {"_id": ObjectId(room_id)})
-        return room
+        ObjectId(room_id)
     except InvalidId:
         raise HTTPException(detail="invalid id", status_code=400)
 
+    entry = await room_cache.get(room_id)
+    if entry is None:
+        return None
+    if request.user.id not in entry.members:
+        raise HTTPException(detail="user not in room", status_code=403)
+    return entry.room
+
 
 @router.get("/friend/{room_id}/")
 @require_authentication()
@@ -112,19 +128,17 @@ async def get_room_friends(
     request: Request, mangodb: mangodb_dependency, db: postgres_dependency, room_id: str
 ):
     try:
-        room_object_id = ObjectId(room_id)
+        ObjectId(room_id)
     except InvalidId:
         raise HTTPException(detail="invalid room id", status_code=403)
 
-    room = await mangodb.find_one(Room, Room.id == room_object_id)
-    if request.user.id not in [usr.user_id for usr in room.users]:
+    entry = await room_cache.get(room_id)
+    if entry is None or request.user.id not in entry.members:
         raise HTTPException(detail="user not in room", status_code=403)
-    friend_user_id = [
-        usr.user_id for usr in room.users if usr.user_id != request.user.id
-    ]
+    room = entry.room
+    friend_user_id = [usr for usr in entry.members if usr != request.user.id]
 
-    friend_users_query = select(User).filter(User.id.in_(friend_user_id))
-    friend_users = (await db.scalars(friend_users_query)).unique().all()
+    friend_users = await UserQuery.many(db, friend_user_id, "identity")
     if room.type == "friend":
         if friend_users:
             return friend_users[0]
@@ -132,6 +146,7 @@ async def get_room_friends(
             if room.is_active:
                 room.is_active = False
                 await mangodb.save(room)
+                await sync_room_cache(room)
             raise HTTPException(detail="friend not found", status_code=404)
 
     return friend_users
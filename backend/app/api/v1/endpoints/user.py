@@ -1,21 +1,37 @@
 from uuid import uuid4
 
 from PIL import Image
-from fastapi import APIRouter, Request, HTTPException, UploadFile, File
-from sqlalchemy import select
+from fastapi import (
+    APIRouter,
+    Request,
+    Response,
+    HTTPException,
+    UploadFile,
+    File,
+    Query,
+)
 from sqlalchemy.exc import IntegrityError
 from starlette import status
 
 from app.core import settings
+from app.core.logger import logger
 from ..handlers.exceptions import UserNotFoundException, IncorrectCredentialsException
-from app.api.permission import require_authentication
-from app.services.auth import Token, bcrypt_context
+from app.api.permission import require_authentication, public
+from app.services.auth import Token
+from app.services.password import hash_password, verify_password
+from app.services.refresh_token import save_refresh_token, delete_all_tokens
 from app.db.postgres.dependency import postgres_dependency
 from app.db.mango.dependency import mangodb_dependency
 from app.db.mango.models.room import Room
 from app.extra.query import UserQuery
-from app.services.websocket.connections import room_connections, main_connections
-from app.db.postgres.models.user import User
+from app.services.presence import presence_table
+from app.services.websocket.dispatch import (
+    publish_room_close,
+    publish_token_revoke,
+    publish_refresh_revoke,
+)
+from app.services.room import sync_room_cache
+from app.services.search import search_users, search_types
 from app.api.v1.schemas.user import (
     CreateUserRequest,
     UpdateUserRequest,
@@ -27,7 +43,6 @@ from app.api.v1.schemas.user import (
 from app.services.user import (
     create_user,
     update_user_data,
-    get_friend_search_res,
     extract_integrity_error,
 )
 from app.utils.image import resize_image
@@ -46,14 +61,15 @@ async def get_user(
     user_id: int | None = None,
 ):
     if user_id:
-        return await UserQuery.one(db, user_id)
+        return await UserQuery.one(db, user_id, "full")
     elif uid:
-        return await UserQuery.one_by_uid(db, uid)
+        return await UserQuery.one_by_uid(db, uid, "full")
 
-    return await UserQuery.one(db, request.user.id)
+    return await UserQuery.one(db, request.user.id, "full")
 
 
 @router.post("/createuser/", status_code=status.HTTP_201_CREATED)
+@public
 async def create_new_user(
     request: Request,
     db: postgres_dependency,
@@ -62,9 +78,7 @@ async def create_new_user(
 ):
     user = await create_user(db, create_user_request)
     token = Token(user).get_token()
-    await Token.save_refresh_token_to_outstanding(
-        mangodb, token.get("refresh_token"), user.id
-    )
+    await save_refresh_token(mangodb, token.get("refresh_token"), user.id)
     return token
 
 
@@ -109,7 +123,7 @@ async def update_username(
     user = await UserQuery.one(db, request.user.id)
     if user is None:
         raise UserNotFoundException()
-    if not bcrypt_context.verify(update_data.password, user.hashed_password):
+    if not await verify_password(update_data.password, user.hashed_password):
         raise IncorrectCredentialsException()
 
     user.username = update_data.username
@@ -133,9 +147,9 @@ async def update_password(
     user = await UserQuery.one(db, request.user.id)
     if user is None:
         raise UserNotFoundException()
-    if not bcrypt_context.verify(update_data.old, user.hashed_password):
+    if not await verify_password(update_data.old, user.hashed_password):
         raise IncorrectCredentialsException()
-    user.hashed_password = bcrypt_context.hash(update_data.new)
+    user.hashed_password = await hash_password(update_data.new)
     await db.commit()
 
     return user
@@ -149,7 +163,7 @@ async def delete_user(
     mangodb: mangodb_dependency,
 ):
 
-    user = await UserQuery.one(db, request.user.id, False)
+    user = await UserQuery.one(db, request.user.id)
     if user is None:
         raise UserNotFoundException()
 
@@ -159,13 +173,21 @@ async def delete_user(
     for room in rooms:
         if room.is_active:
             room.is_active = False
-            await mangodb.commit()
-        if str(room.id) in room_connections:
-            # close the room
-            del room_connections[str(room.id)]
+            await mangodb.save(room)
+            await sync_room_cache(room)
+        # close the room on every worker
+        await publish_room_close(str(room.id))
 
     await db.delete(user)
     await db.commit()
+    await publish_token_revoke(user.id)
+    _, revoked = await delete_all_tokens(user.id)
+    await publish_refresh_revoke(revoked)
+    try:
+        presence_table.forget(user.id)
+    except TimeoutError as exc:
+        # the row goes stale and is swept out later
+        logger.warning(f"presence row of user {user.id} not freed: {exc}")
     return user
 
 
@@ -173,63 +195,26 @@ async def delete_user(
 @require_authentication()
 async def search_user(
     request: Request,
+    response: Response,
     db: postgres_dependency,
     search_type: str = "",
     search: str = "",
-    offset: int = 0,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=50),
+    cursor: str | None = None,
 ):
-    if search_type not in ("name", "uid", "contact"):
+    """The next page is requested with the cursor sent back in X-Next-Cursor"""
+    if search_type not in search_types:
         raise HTTPException(
             detail="search type must be in (name, uid, contact)",
             status_code=400,
         )
 
-    self_user = await UserQuery.one(db, request.user.id)
-
-    if search == "" or search_type == "":
-        stmt = (
-            select(User).where(User.id != request.user.id).offset(offset).limit(limit)
-        )
-        users = (await db.scalars(stmt)).unique().all()
-
-        return get_friend_search_res(users, self_user)
-
-    stmt = select(User)
-
-    if search_type == "name":
-        if search.split(" ").__len__() == 1:
-            stmt = stmt.where(
-                User.first_name.ilike(f"%{search}%")
-                | User.last_name.ilike(f"%{search}")
-            )
-        else:
-            stmt = stmt.where(
-                (
-                    User.first_name.ilike(f"%{search.split(" ")[0]}%")
-                    & User.last_name.ilike(f"%{search.split(" ")[1]}%")
-                )
-                | (
-                    User.first_name.ilike(f"%{search.split(" ")[1]}%")
-                    & User.last_name.ilike(f"%{search.split(" ")[0]}%")
-                )
-            )
-
-    elif search_type == "uid":
-        stmt = stmt.where(User.uid == search)
-    else:
-        try:
-            stmt = stmt.where(User.contact_number == int(search))
-        except ValueError:
-            raise HTTPException(
-                detail="search word is not valid for contact number", status_code=400
-            )
-
-    stmt = stmt.offset(offset).limit(limit)
-
-    users = (await db.scalars(stmt)).unique().all()
-
-    return get_friend_search_res(users, self_user)
+    users, next_cursor = await search_users(
+        db, request.user.id, search_type, search, limit, cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
 
 
 @router.get("/onlineuser/", response_model=list[OnlineUserResponse])
@@ -239,11 +224,16 @@ async def get_online_user(
     mango: mangodb_dependency,
     db: postgres_dependency,
 ):
-    user = await UserQuery.one(db, request.user.id, True)
-    online_users = []
-    for friend in (*user.friend, *user.friend_by):
-        if friend.id in main_connections.keys():
-            online_users.append(friend)
+    user = await UserQuery.one(db, request.user.id, "friends")
+    friends = (*user.friend, *user.friend_by)
+    try:
+        online_ids = presence_table.online(friend.id for friend in friends)
+    except TimeoutError:
+        raise HTTPException(
+            detail="presence is busy, try again",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    online_users = [friend for friend in friends if friend.id in online_ids]
     response = []
     for user in online_users:
         room_users = [user.id, request.user.id]
@@ -2,6 +2,8 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 from app.services.websocket.main_manager import MainConnectionManager
 from app.services.websocket.room_manager import RoomManager
+from app.services.websocket.heartbeat import heartbeat_wheel, PONG
+from app.services.websocket.throttle import FrameThrottle
 from app.core.logger import logger
 
 router = APIRouter(prefix="/ws", tags=["ws"])
@@ -9,31 +11,45 @@ router = APIRouter(prefix="/ws", tags=["ws"])
 
 @router.websocket("/")
 async def websocket_main(websocket: WebSocket):
-    websocket_user = None
+    con = beat = None
     try:
         con = await MainConnectionManager.connect(websocket)
-        websocket_user = con.user_id
+        beat = heartbeat_wheel.register(con.outbox)
+        throttle = FrameThrottle(con.outbox, con.user_id)
         while True:
             data = await websocket.receive_text()
+            beat.touch()
+            if data == PONG or not throttle.allow():
+                continue
             await con.handle_msg(data)
     except WebSocketDisconnect:
-        logger.info(f"user with id {websocket_user} main websocket closed")
+        logger.info(f"user with id {con and con.user_id} main websocket closed")
     finally:
-        if websocket_user:
-            MainConnectionManager.disconnect(websocket_user)
+        if beat:
+            heartbeat_wheel.unregister(beat)
+        if con:
+            await MainConnectionManager.disconnect(con)
 
 
 @router.websocket("/{room_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str):
-    websocket_user = None
+    room = websocket_user = device_id = outbox = beat = None
     try:
-        room, user_id = await RoomManager.connect(websocket, room_id)
-        websocket_user = user_id
+        room, websocket_user, device_id, outbox = await RoomManager.connect(
+            websocket, room_id
+        )
+        beat = heartbeat_wheel.register(outbox)
+        throttle = FrameThrottle(outbox, websocket_user, room_id)
         while True:
             data = await websocket.receive_text()
-            await room.handle_msg(data)
+            beat.touch()
+            if data == PONG or not throttle.allow():
+                continue
+            await room.handle_msg(data, websocket_user)
     except WebSocketDisconnect:
         logger.info(f"user with id {websocket_user} room websocket closed")
     finally:
-        if websocket_user:
-            RoomManager.disconnect(room_id, websocket_user)
+        if beat:
+            heartbeat_wheel.unregister(beat)
+        if room:
+            RoomManager.disconnect(room_id, websocket_user, device_id, outbox)
@@ -1,3 +1,5 @@
+import math
+
 from fastapi import HTTPException
 from starlette import status
 
@@ -36,3 +38,15 @@ class AdminRequiredException(AuthException):
 class UserNotFoundException(AuthException):
     status_code = status.HTTP_404_NOT_FOUND
     details = "User not found"
+
+
+class TooManyRequestsException(HTTPException):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    details = "Too many requests, slow down"
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(
+            self.status_code,
+            self.details,
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
@@ -8,6 +8,7 @@ from app.api.v1.endpoints import (
     notification,
     websocket,
     relationship,
+    metrics,
 )
 
 v1_router = APIRouter(prefix="/api/v1")
@@ -19,3 +20,4 @@ v1_router.include_router(user.router)
 v1_router.include_router(notification.router)
 v1_router.include_router(websocket.router)
 v1_router.include_router(relationship.router)
+v1_router.include_router(metrics.router)
@@ -11,6 +11,11 @@ class ChatHistoryResponse(BaseModel):
     quantity: int
 
 
+class MessagePage(BaseModel):
+    messages: list[Message]
+    next_cursor: str | None = None
+
+
 class OnlineUserResponse(BaseModel):
     user: UserModel
     room: Room
@@ -2,13 +2,14 @@ from pydantic import BaseModel
 
 from .user import UserModel
 from app.db.postgres.models.notification import NotificationType
+from app.utils.date import ApiDateTime
 
 
 class NotificationModel(BaseModel):
     id: int
     is_read: bool
-    created_at: str
-    read_at: str | None = None
+    created_at: ApiDateTime
+    read_at: ApiDateTime | None = None
     notification_type: NotificationType
     message: str
     sender_id: int
@@ -6,13 +6,40 @@ from app.db.mango.models.message import Message
 from .notification import NotificationModel
 from .user import UserModel
 
-type EventType = Literal["new_message", "change_message_status", "notification"]
+type EventType = Literal[
+    "new_message",
+    "change_message_status",
+    "message_receipt",
+    "notification",
+    "presence",
+    "message_backlog",
+]
+
+
+class MessageReceipt(BaseModel):
+    room_id: str
+    reader_id: int
+    status: str
+    up_to: str
+
+
+class PresenceChange(BaseModel):
+    user_id: int
+    is_online: bool
+    last_seen: float | None = None
 
 
 class WebSocketResponse(BaseModel):
     event_type: EventType
-    data: list[Message] | list[NotificationModel]
-    sender_user: UserModel
+    data: (
+        list[Message]
+        | list[NotificationModel]
+        | list[MessageReceipt]
+        | list[PresenceChange]
+    )
+    sender_user: UserModel | None = None
+    # committed watermark of the room on message events, the seq to resume from
+    committed: int | None = None
 
     @model_validator(mode="after")
     def validate_data_type(self):
@@ -21,10 +48,24 @@ class WebSocketResponse(BaseModel):
                 raise ValueError(
                     "Data must be a list of NotificationModel for 'notification' event_type"
                 )
-        elif self.event_type in ("new_message", "change_message_status"):
+        elif self.event_type == "message_receipt":
+            if not all(isinstance(item, MessageReceipt) for item in self.data):
+                raise ValueError(
+                    "Data must be a list of MessageReceipt for 'message_receipt' event_type"
+                )
+        elif self.event_type == "presence":
+            if not all(isinstance(item, PresenceChange) for item in self.data):
+                raise ValueError(
+                    "Data must be a list of PresenceChange for 'presence' event_type"
+                )
+        elif self.event_type in (
+            "new_message",
+            "change_message_status",
+            "message_backlog",
+        ):
             if not all(isinstance(item, Message) for item in self.data):
                 raise ValueError(
-                    "Data must be a list of Message for 'new_message' or 'change_message_status' event_type"
+                    "Data must be a list of Message for 'new_message', 'change_message_status' or 'message_backlog' event_type"
                 )
 
         return self
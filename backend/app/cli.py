@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import json
+
+from app.db.indexes import apply_indexes, index_report
+from app.db.timestamps import migrate_mongo_timestamps
+from app.services.inbox import rebuild_inbox
+from app.services.refresh_token import migrate_legacy_tokens
+from app.db.mango.session import mango_sessionmanager
+from app.db.postgres.session import sessionmanager
+
+
+async def indexes(args: argparse.Namespace) -> None:
+    if args.action == "apply":
+        await apply_indexes()
+    print(json.dumps(await index_report(), indent=2))
+
+
+async def inbox(args: argparse.Namespace) -> None:
+    written = await rebuild_inbox()
+    print(f"rebuilt {written} inbox entries")
+
+
+async def timestamps(args: argparse.Namespace) -> None:
+    converted = await migrate_mongo_timestamps()
+    print(json.dumps(converted, indent=2))
+
+
+async def tokens(args: argparse.Namespace) -> None:
+    migrated = await migrate_legacy_tokens()
+    print(json.dumps(migrated, indent=2))
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        await args.handler(args)
+    finally:
+        await sessionmanager.close()
+        await mango_sessionmanager.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(required=True)
+
+    index_parser = commands.add_parser(
+        "indexes", help="create the registered indexes or report missing/unused ones"
+    )
+    index_parser.add_argument("action", choices=["apply", "report"])
+    index_parser.set_defaults(handler=indexes)
+
+    inbox_parser = commands.add_parser(
+        "inbox", help="recompute the inbox entries from the rooms and messages"
+    )
+    inbox_parser.add_argument("action", choices=["rebuild"])
+    inbox_parser.set_defaults(handler=inbox)
+
+    timestamps_parser = commands.add_parser(
+        "timestamps",
+        help="convert the formatted string timestamps of mongo documents to datetimes",
+    )
+    timestamps_parser.add_argument("action", choices=["migrate"])
+    timestamps_parser.set_defaults(handler=timestamps)
+
+    tokens_parser = commands.add_parser(
+        "tokens",
+        help="copy the legacy raw refresh token collections to the hashed store",
+    )
+    tokens_parser.add_argument("action", choices=["migrate"])
+    tokens_parser.set_defaults(handler=tokens)
+
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,15 @@ BASE_DIR = os.path.abspath(__file__)
 
 DEBUG = False
 
-DATABASE = {"URL": config["DATABASE_URL"], "MANGODB_URL": config["MANGODB_URL"]}
+# MANGODB_NAME can also come from the environment, the benchmarks run against their
+# own database this way
+DATABASE = {
+    "URL": config["DATABASE_URL"],
+    "MANGODB_URL": config["MANGODB_URL"],
+    "MANGODB_NAME": (
+        os.environ.get("MANGODB_NAME") or config.get("MANGODB_NAME") or "chatsystem"
+    ),
+}
 
 SUPER_USER = {"ACCESS_PASSWORD": config["CREATE_SUPERUSER_PASSWORD"]}
 
@@ -27,3 +35,68 @@ JWT = {
 STATIC = "files"
 
 STATICFILES_DIR = os.path.join(BASE_DIR, STATIC)
+
+# Cross-worker websocket fan-out. Leave BROKER_URL unset to keep every event in
+# process, or point it at any redis protocol compatible server (redis://host:6379)
+BROKER = {"URL": config.get("BROKER_URL"), "CHANNEL": "hellochat.events"}
+
+# Per connection outbound queue. OVERFLOW_POLICY is one of
+# "drop_oldest", "coalesce" or "disconnect".
+# RECEIPT_DEBOUNCE is the window (seconds) message status changes are batched over
+# RESUME_LIMIT caps the missed messages replayed on reconnect, beyond it the
+# client is told to resync over http
+WEBSOCKET = {
+    "OUTBOX_SIZE": 256,
+    "OVERFLOW_POLICY": "drop_oldest",
+    "RECEIPT_DEBOUNCE": 0.3,
+    "RESUME_LIMIT": 500,
+}
+
+# Websocket keepalive, in seconds. Idle connections are pinged after INTERVAL and
+# closed after TIMEOUT without any inbound frame; TICK is the scheduler resolution
+HEARTBEAT = {"INTERVAL": 25, "TIMEOUT": 60, "TICK": 1}
+
+# Token buckets, RATE in tokens per second and BURST the bucket size. Every inbound
+# websocket frame costs a token of its connection, its user and its room
+RATE_LIMIT = {
+    "WS_CONNECTION": {"RATE": 5, "BURST": 20},
+    "WS_USER": {"RATE": 10, "BURST": 40},
+    "WS_ROOM": {"RATE": 50, "BURST": 200},
+    "RELATIONSHIP": {"RATE": 0.5, "BURST": 10},
+}
+
+# Group commit of new messages, a batch is written once MAX_BATCH messages are
+# queued or the oldest waited MAX_DELAY seconds. A room sequence range reserved but
+# not released after RESERVATION_TIMEOUT seconds (a crashed worker) stops holding
+# back the committed watermark
+MESSAGE_PIPELINE = {"MAX_BATCH": 128, "MAX_DELAY": 0.005, "RESERVATION_TIMEOUT": 30}
+
+# In-process caches, TTL in seconds
+# TOKEN_SIZE bounds the verified access token cache of the auth middleware
+CACHE = {"ROOM_TTL": 300, "ROOM_SIZE": 10_000, "TOKEN_SIZE": 10_000}
+
+# Presence table shared by every worker of the host. A user with open connections
+# counts as online until its row goes STALE_AFTER seconds without a REFRESH, rows of
+# users gone for longer are reused and swept out every SWEEP seconds. Taking the
+# table lock gives up after LOCK_TIMEOUT seconds instead of stalling the event loop
+PRESENCE = {
+    "SHM_NAME": "hellochat_presence",
+    "CAPACITY": 1 << 16,
+    "REFRESH": 30,
+    "STALE_AFTER": 90,
+    "SWEEP": 300,
+    "LOCK_TIMEOUT": 0.05,
+}
+
+# bcrypt runs on a dedicated thread pool of WORKERS threads, at most MAX_QUEUE calls
+# wait for a thread. Hashes with another cost than BCRYPT_ROUNDS are upgraded on login
+PASSWORD = {
+    "BCRYPT_ROUNDS": int(config.get("BCRYPT_ROUNDS") or 12),
+    "WORKERS": 4,
+    "MAX_QUEUE": 64,
+}
+
+# Bloom filter of revoked refresh token hashes, checked before the database. 1 << 24
+# bits with 7 hashes stays under 1% false positives up to about 1.7M tokens. Every
+# SWEEP seconds expired tokens are deleted and the filter rebuilt without them
+REFRESH_TOKEN_FILTER = {"BITS": 1 << 24, "HASHES": 7, "SWEEP": 3600}
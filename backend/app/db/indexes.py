@@ -0,0 +1,180 @@
+from odmantic import Model
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from sqlalchemy import inspect, text
+
+from app.core.logger import logger
+from app.db.mango.models.inbox import Inbox
+from app.db.mango.models.message import Message
+from app.db.mango.models.room import Room
+from app.db.mango.models.token import (
+    BlackListedRefreshToken,
+    OutstandingRefreshToken,
+    RefreshTokenState,
+)
+from app.db.mango.session import mango_sessionmanager
+from app.db.postgres.session import sessionmanager
+from app.db.postgres.target import Base
+
+# Every index the queries of the app rely on. Postgres indexes are declared on the
+# models (index=True / __table_args__) and mirrored by the alembic migrations.
+MONGO_INDEXES: dict[type[Model], list[IndexModel]] = {
+    Message: [
+        # history pages and receipts: room_id equality, _id range and sort
+        IndexModel([("room_id", ASCENDING), ("_id", ASCENDING)]),
+        # replay on reconnect by room sequence
+        IndexModel([("room_id", ASCENDING), ("seq", ASCENDING)]),
+    ],
+    Room: [IndexModel([("users.user_id", ASCENDING), ("type", ASCENDING)])],
+    Inbox: [
+        IndexModel([("user_id", ASCENDING), ("room_id", ASCENDING)], unique=True),
+        # chat list of a user, most recent first
+        IndexModel(
+            [
+                ("user_id", ASCENDING),
+                ("last_activity", DESCENDING),
+                ("_id", DESCENDING),
+            ]
+        ),
+    ],
+    RefreshTokenState: [
+        IndexModel([("token_hash", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("state", ASCENDING)]),
+        # mongo removes the document once expires_at is in the past
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    # legacy raw token stores, only read by `tokens migrate` and emptied by their
+    # TTL index once the last token expires; user_id serves delete_all_tokens
+    OutstandingRefreshToken: [
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    BlackListedRefreshToken: [
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+def mongo_index_name(index: IndexModel) -> str:
+    return index.document["name"]
+
+
+async def apply_mongo_indexes() -> None:
+    engine = mango_sessionmanager.engine
+    for model, indexes in MONGO_INDEXES.items():
+        # create_indexes is a no-op for indexes that already exist with the same spec
+        await engine.get_collection(model).create_indexes(indexes)
+
+
+# operator classes an index can only use once the migrations created the extension
+OPERATOR_CLASS_EXTENSIONS = {"gin_trgm_ops": "pg_trgm"}
+
+
+def _missing_requirements(index, columns: set[str], extensions: set[str]) -> list:
+    missing = [column.name for column in index.columns if column.name not in columns]
+    for operator_class in index.dialect_options["postgresql"]["ops"].values():
+        extension = OPERATOR_CLASS_EXTENSIONS.get(operator_class)
+        if extension and extension not in extensions:
+            missing.append(extension)
+    return missing
+
+
+def _create_postgres_indexes(connection) -> None:
+    # on a database the migrations have not reached yet, indexes over columns or
+    # extensions that do not exist are left to the migration that adds them
+    inspector = inspect(connection)
+    extensions = set(connection.scalars(text("SELECT extname FROM pg_extension")))
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            logger.warning(f"table {table.name} missing, run the migrations")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            missing = _missing_requirements(index, columns, extensions)
+            if missing:
+                logger.warning(
+                    f"index {index.name} skipped, {missing} missing: run the migrations"
+                )
+                continue
+            index.create(connection, checkfirst=True)
+
+
+async def apply_postgres_indexes() -> None:
+    async with sessionmanager.connect() as connection:
+        await connection.run_sync(_create_postgres_indexes)
+
+
+async def apply_indexes() -> None:
+    for name, apply in (
+        ("mongo", apply_mongo_indexes),
+        ("postgres", apply_postgres_indexes),
+    ):
+        try:
+            await apply()
+        except Exception as exc:
+            logger.exception(f"failed to apply {name} indexes: {exc}")
+
+
+async def mongo_index_report() -> dict:
+    engine = mango_sessionmanager.engine
+    report = {}
+    for model, indexes in MONGO_INDEXES.items():
+        collection = engine.get_collection(model)
+        existing = await collection.index_information()
+        stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+        report[collection.name] = {
+            "missing": [
+                mongo_index_name(index)
+                for index in indexes
+                if mongo_index_name(index) not in existing
+            ],
+            "unused": sorted(
+                stat["name"]
+                for stat in stats
+                if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0
+            ),
+        }
+    return report
+
+
+def _postgres_existing_indexes(connection) -> dict[str, set[str]]:
+    inspector = inspect(connection)
+    return {
+        table.name: {index["name"] for index in inspector.get_indexes(table.name)}
+        for table in Base.metadata.sorted_tables
+    }
+
+
+async def postgres_index_report() -> dict:
+    # idx_scan counts since the last statistics reset, constraint indexes are
+    # left out since they are needed regardless of reads
+    unused_query = text(
+        """
+        SELECT s.relname, s.indexrelname
+        FROM pg_stat_user_indexes s
+        JOIN pg_index i ON i.indexrelid = s.indexrelid
+        WHERE s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary
+        """
+    )
+    async with sessionmanager.connect() as connection:
+        existing = await connection.run_sync(_postgres_existing_indexes)
+        unused = (await connection.execute(unused_query)).all()
+
+    report = {}
+    for table in Base.metadata.sorted_tables:
+        report[table.name] = {
+            "missing": sorted(
+                index.name
+                for index in table.indexes
+                if index.name not in existing[table.name]
+            ),
+            "unused": sorted(name for relname, name in unused if relname == table.name),
+        }
+    return report
+
+
+async def index_report() -> dict:
+    return {
+        "mongo": await mongo_index_report(),
+        "postgres": await postgres_index_report(),
+    }
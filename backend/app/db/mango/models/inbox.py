@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from odmantic import Model
+
+
+class Inbox(Model):
+    """Chat list entry of one member of a room, maintained on every write"""
+
+    model_config = {"collection": "inbox"}
+
+    user_id: int
+    room_id: str
+    last_message_id: Optional[ObjectId] = None
+    last_activity: datetime
+    unread: int = 0
@@ -2,7 +2,7 @@ from odmantic import Field, Model
 from pydantic import field_validator
 from typing import Optional
 
-from app.utils.date import formated_date
+from app.utils.date import ApiDateTime, utc_now
 
 valid_message_type = ["text", "video", "image", "document", "links"]
 valid_message_status = ["sent", "delivered", "seen"]
@@ -13,10 +13,12 @@ class Message(Model):
     sender_id: int
     message_text: Optional[str] = None
     message_type: str = Field(default="text")
-    created_at: str = Field(default_factory=formated_date)
+    created_at: ApiDateTime = Field(default_factory=utc_now)
     file_links: Optional[list[str]] = None
     status: str = Field(default="sent")
     seen_by: list[int] = Field(default=[])
+    # position of the message in its room, assigned when it is written
+    seq: Optional[int] = None
 
     @field_validator("message_type")
     @classmethod
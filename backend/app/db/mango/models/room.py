@@ -1,14 +1,14 @@
 from odmantic import Field, Model
 from pydantic import field_validator
 from typing import Optional
-from app.utils.date import formated_date
+from app.utils.date import ApiDateTime, utc_now
 
 valid_chatroom_type = ["group", "friend"]
 
 class RoomUser(Model):
     user_id: int
     added_by: Optional[int] = None
-    joined_at: str = Field(default_factory=formated_date)
+    joined_at: ApiDateTime = Field(default_factory=utc_now)
     isAdmin: bool
 
 
@@ -17,7 +17,7 @@ class Room(Model):
         "collection":"chat_room"
     }
     users: list[RoomUser]
-    created_at: str = Field(default_factory=formated_date)
+    created_at: ApiDateTime = Field(default_factory=utc_now)
     type: str
     created_by: Optional[int] = None
     is_active: bool
@@ -1,19 +1,48 @@
 from odmantic import Model, Field
 from datetime import datetime
+from typing import Optional
+from pydantic import field_validator
 from app.core.settings import JWT
+from app.utils.date import utc_now
 
+valid_refresh_token_state = ["outstanding", "blacklisted"]
 
+
+class RefreshTokenState(Model):
+    """Issued refresh token, stored by the sha256 hex digest of the token"""
+
+    model_config = {"collection": "refresh_token_state"}
+
+    token_hash: str
+    user_id: int
+    state: str = Field(default="outstanding")
+    created_at: datetime = Field(default_factory=utc_now)
+    expires_at: datetime = Field(
+        default_factory=lambda: utc_now() + JWT["REFRESH_TOKEN_EXPIRES"]
+    )
+    revoked_at: Optional[datetime] = None
+
+    @field_validator("state")
+    @classmethod
+    def validate_state(cls, v: str):
+        if v not in valid_refresh_token_state:
+            raise ValueError(f"state must be one of {valid_refresh_token_state}")
+        return v
+
+
+# Legacy collections keyed by the raw token, only read by `python -m app.cli tokens
+# migrate`. Their TTL index empties them once the last token expires.
 class OutstandingRefreshToken(Model):
-    created_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=utc_now)
     expires_at: datetime = Field(
-        default_factory=lambda: datetime.now() + JWT["REFRESH_TOKEN_EXPIRES"]
+        default_factory=lambda: utc_now() + JWT["REFRESH_TOKEN_EXPIRES"]
     )
     token: str
     user_id: int
 
 
 class BlackListedRefreshToken(Model):
-    blacklisted_at: datetime = Field(default_factory=datetime.now)
+    blacklisted_at: datetime = Field(default_factory=utc_now)
     expires_at: datetime
     token: str
     user_id: int
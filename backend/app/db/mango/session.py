@@ -17,4 +17,6 @@ class MangoSessionManager:
         self.client = None
 
 
-mango_sessionmanager = MangoSessionManager(DATABASE["MANGODB_URL"], "chatsystem")
+mango_sessionmanager = MangoSessionManager(
+    DATABASE["MANGODB_URL"], DATABASE["MANGODB_NAME"]
+)
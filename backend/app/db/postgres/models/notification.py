@@ -1,14 +1,15 @@
 import enum
+from datetime import datetime
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.postgresql import ENUM as PGENUM
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, relationship
 
 from .user import User
 from ..base import Base
-from app.utils.date import formated_date
+from app.utils.date import utc_now
 from sqlalchemy.ext.mutable import MutableDict
 
 
@@ -35,8 +36,12 @@ class Notification(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     is_read: Mapped[bool] = mapped_column(default=False)
-    created_at: Mapped[str] = mapped_column(default=formated_date())
-    read_at: Mapped[str] = mapped_column(default=None, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utc_now
+    )
+    read_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=None, nullable=True
+    )
     notification_type: Mapped[NotificationType] = mapped_column(
         PGENUM(NotificationType, name="notification_type"),
         default=NotificationType.FRIEND_REQUEST,
@@ -44,7 +49,7 @@ class Notification(Base):
     message: Mapped[str]
     sender_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     receiver_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="CASCADE"), nullable=True
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True
     )
     extra_data: Mapped[dict] = mapped_column(MutableDict.as_mutable(JSONB), default={})
 
@@ -57,6 +62,7 @@ class Notification(Base):
     linked_notification: Mapped["Notification"] = relationship(
         "Notification",
         remote_side=[id],
-        backref="parent_notification",
+        # the database cascades the delete to the notifications linking here
+        backref=backref("parent_notification", passive_deletes=True),
         lazy="joined",
     )
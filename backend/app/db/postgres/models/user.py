@@ -1,5 +1,5 @@
-from sqlalchemy import ForeignKey, BigInteger
-from sqlalchemy.orm import Mapped, mapped_column, Relationship
+from sqlalchemy import ForeignKey, BigInteger, Computed, Index, literal
+from sqlalchemy.orm import Mapped, mapped_column, Relationship, query_expression
 from shortuuid import uuid
 
 from ..base import Base
@@ -7,39 +7,62 @@ from ..base import Base
 
 class BlockedUser(Base):
     __tablename__ = "BlockedUser"
+    __table_args__ = (
+        Index("ix_BlockedUser_user_id_blocked_user_id", "user_id", "blocked_user_id"),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     blocked_user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="CASCADE")
+        ForeignKey("users.id", ondelete="CASCADE"), index=True
     )
 
 
 class RequestedUser(Base):
     __tablename__ = "RequestedUser"
+    __table_args__ = (
+        Index(
+            "ix_RequestedUser_user_id_requested_user_id",
+            "user_id",
+            "requested_user_id",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     requested_user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="CASCADE")
+        ForeignKey("users.id", ondelete="CASCADE"), index=True
     )
 
 
 class Friend(Base):
     __tablename__ = "Friend"
+    __table_args__ = (
+        Index("ix_Friend_user_id_friend_user_id", "user_id", "friend_user_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     friend_user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="CASCADE")
+        ForeignKey("users.id", ondelete="CASCADE"), index=True
     )
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # trigram index behind name search (app/services/search.py), serves ILIKE
+        # substring and prefix patterns as well as the word similarity operator
+        Index(
+            "ix_users_full_name_trgm",
+            "full_name",
+            postgresql_using="gin",
+            postgresql_ops={"full_name": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
-    uid: Mapped[str] = mapped_column(server_default=uuid())
+    uid: Mapped[str] = mapped_column(server_default=uuid(), index=True)
     first_name: Mapped[str]
     last_name: Mapped[str]
     email: Mapped[str] = mapped_column(unique=True)
@@ -55,27 +78,63 @@ class User(Base):
     is_active: Mapped[bool] = mapped_column(server_default="True", default=True)
     username: Mapped[str] = mapped_column(unique=True)
     hashed_password: Mapped[str]
+    full_name: Mapped[str] = mapped_column(
+        Computed("first_name || ' ' || last_name", persisted=True)
+    )
+
+    # relationship to the searching user, filled per query with with_expression
+    friend_status: Mapped[str] = query_expression(literal("none"))
 
+    # Relationships raise when touched without being loaded, every query states what
+    # it needs through a load profile (app/extra/query.py). The join table rows are
+    # removed by their ON DELETE CASCADE, so deleting a user loads none of them.
     blocked_user: Mapped[list["User"]] = Relationship(
         secondary=BlockedUser.__tablename__,
         primaryjoin="BlockedUser.user_id == User.id",
         secondaryjoin="BlockedUser.blocked_user_id == User.id",
-        lazy="joined",
-        backref="blocked_by",
+        lazy="raise",
+        passive_deletes=True,
+        back_populates="blocked_by",
+    )
+    blocked_by: Mapped[list["User"]] = Relationship(
+        secondary=BlockedUser.__tablename__,
+        primaryjoin="BlockedUser.blocked_user_id == User.id",
+        secondaryjoin="BlockedUser.user_id == User.id",
+        lazy="raise",
+        passive_deletes=True,
+        back_populates="blocked_user",
     )
 
     friend: Mapped[list["User"]] = Relationship(
         secondary=Friend.__tablename__,
         primaryjoin="Friend.user_id == User.id",
         secondaryjoin="Friend.friend_user_id == User.id",
-        lazy="joined",
-        backref="friend_by",
+        lazy="raise",
+        passive_deletes=True,
+        back_populates="friend_by",
+    )
+    friend_by: Mapped[list["User"]] = Relationship(
+        secondary=Friend.__tablename__,
+        primaryjoin="Friend.friend_user_id == User.id",
+        secondaryjoin="Friend.user_id == User.id",
+        lazy="raise",
+        passive_deletes=True,
+        back_populates="friend",
     )
 
     requested_user: Mapped[list["User"]] = Relationship(
         secondary=RequestedUser.__tablename__,
         primaryjoin="RequestedUser.user_id == User.id",
         secondaryjoin="RequestedUser.requested_user_id == User.id",
-        lazy="joined",
-        backref="requested_by",
+        lazy="raise",
+        passive_deletes=True,
+        back_populates="requested_by",
+    )
+    requested_by: Mapped[list["User"]] = Relationship(
+        secondary=RequestedUser.__tablename__,
+        primaryjoin="RequestedUser.requested_user_id == User.id",
+        secondaryjoin="RequestedUser.user_id == User.id",
+        lazy="raise",
+        passive_deletes=True,
+        back_populates="requested_user",
     )
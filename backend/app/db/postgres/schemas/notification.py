@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field
 
 from app.db.postgres.models.notification import NotificationType
 from app.db.postgres.schemas.user import UserSchema
+from app.utils.date import ApiDateTime
 
 
 class NotificationSchema(BaseModel):
@@ -9,8 +10,8 @@ class NotificationSchema(BaseModel):
 
     id: int
     is_read: bool = False
-    created_at: str
-    read_at: str | None = None
+    created_at: ApiDateTime
+    read_at: ApiDateTime | None = None
     notification_type: NotificationType
     message: str
     sender_id: int
@@ -0,0 +1,54 @@
+from pymongo import UpdateOne
+
+from app.db.mango.models.message import Message
+from app.db.mango.models.room import Room
+from app.db.mango.session import mango_sessionmanager
+from app.utils.date import parse_formated_date
+
+# Messages and rooms used to store formatted strings, this rewrites them as utc
+# datetimes. Documents already converted are skipped so it can be run again.
+BATCH_SIZE = 1000
+is_string = {"$type": "string"}
+
+
+def _parse(value):
+    return parse_formated_date(value) if isinstance(value, str) else value
+
+
+async def _bulk_update(collection, query: dict, projection: dict, build_set) -> int:
+    converted = 0
+    updates = []
+    async for doc in collection.find(query, projection):
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": build_set(doc)}))
+        if len(updates) >= BATCH_SIZE:
+            result = await collection.bulk_write(updates, ordered=False)
+            converted += result.modified_count
+            updates = []
+    if updates:
+        result = await collection.bulk_write(updates, ordered=False)
+        converted += result.modified_count
+    return converted
+
+
+def _room_set(doc: dict) -> dict:
+    users = [
+        {**user, "joined_at": _parse(user.get("joined_at"))} for user in doc["users"]
+    ]
+    return {"created_at": _parse(doc["created_at"]), "users": users}
+
+
+async def migrate_mongo_timestamps() -> dict[str, int]:
+    engine = mango_sessionmanager.engine
+    messages = await _bulk_update(
+        engine.get_collection(Message),
+        {"created_at": is_string},
+        {"created_at": 1},
+        lambda doc: {"created_at": _parse(doc["created_at"])},
+    )
+    rooms = await _bulk_update(
+        engine.get_collection(Room),
+        {"$or": [{"created_at": is_string}, {"users.joined_at": is_string}]},
+        {"created_at": 1, "users": 1},
+        _room_set,
+    )
+    return {"messages": messages, "rooms": rooms}
@@ -1,8 +1,8 @@
-from typing import Coroutine, cast, Sequence, Type, Generic, TypeVar
+from typing import Coroutine, cast, Iterable, Sequence, Type, Generic, TypeVar
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, raiseload, selectinload
 
 from app.db.postgres.models.user import User
 from app.db.postgres.models.notification import Notification
@@ -10,17 +10,28 @@ from abc import ABC, abstractmethod
 
 T = TypeVar("T")
 
+# Load profiles name the relationships a caller needs. Anything a profile leaves out
+# raises instead of silently issuing a query (an object already in the session is
+# still returned), so every profile ends with the wildcard raiseload. Collections
+# use selectinload, one extra SELECT ... IN each, so rows never multiply. Many-to-one
+# relations are joined.
+IDENTITY = (raiseload("*", sql_only=True),)
+
 
 class Query(Generic[T], ABC):
+    load_profiles: dict[str, tuple] = {"identity": IDENTITY}
+
     def __init__(
         self,
         db: AsyncSession,
         filter_data: dict | None = None,
-        options: bool = True,
+        profile: str = "identity",
         limit: int | None = None,
         offset: int | None = None,
         order_by: tuple[str, str] | None = None,
     ):
+        if profile not in self.load_profiles:
+            raise ValueError(f"profile must be one of {tuple(self.load_profiles)}")
         if filter_data:
             self.validate_model_attribute(tuple(filter_data.keys()), self.data_model)
         if order_by:
@@ -29,7 +40,7 @@ class Query(Generic[T], ABC):
             self.validate_model_attribute((order_by[0],), self.data_model)
         self.db = db
         self.filter_data = filter_data
-        self.options = options
+        self.profile = profile
         self.limit = limit
         self.offset = offset
         self.order_by = order_by
@@ -57,9 +68,7 @@ class Query(Generic[T], ABC):
                     raise AttributeError(
                         f"{k} is not a valid attribute of {self.data_model.__name__}"
                     )
-        if self.options:
-            for relation in self.data_model.__mapper__.relationships.items():
-                query = query.options(joinedload(getattr(self.data_model, relation[0])))
+        query = query.options(*self.load_profiles[self.profile])
         if self.order_by:
             query = query.order_by(
                 getattr(self.data_model, self.order_by[0]).asc()
@@ -80,13 +89,21 @@ class Query(Generic[T], ABC):
 
     @classmethod
     async def one(
-        cls, db: AsyncSession, model_id: int, option: bool = True
+        cls, db: AsyncSession, model_id: int, profile: str = "identity"
     ) -> T | None:
-        return (await cls(db, {"id": model_id}, option).get_data()).one_or_none()
+        return (await cls(db, {"id": model_id}, profile).get_data()).one_or_none()
+
+    @classmethod
+    async def many(
+        cls, db: AsyncSession, model_ids: Iterable[int], profile: str = "identity"
+    ) -> Sequence[T]:
+        query = cls(db, profile=profile).generate_query()
+        query = query.where(cls.data_model.id.in_(model_ids))
+        return (await db.scalars(query)).unique().all()
 
     @classmethod
     async def all(cls, db: AsyncSession) -> Sequence[T]:
-        return (await cls(db, options=False).get_data()).all()
+        return (await cls(db).get_data()).all()
 
     async def get_all_filter(self) -> Sequence[T]:
         return (await self.get_data()).all()
@@ -95,29 +112,70 @@ class Query(Generic[T], ABC):
         return (await self.get_data()).one_or_none()
 
 
+def user_collections(*names: str) -> tuple:
+    # the related users come without any of their own relationships
+    return (
+        *(
+            selectinload(getattr(User, name)).raiseload("*", sql_only=True)
+            for name in names
+        ),
+        *IDENTITY,
+    )
+
+
 class UserQuery(Query[User]):
     data_model = User
+    load_profiles = {
+        # columns only
+        "identity": IDENTITY,
+        # both directions of the friendship
+        "friends": user_collections("friend", "friend_by"),
+        # what the user did to others, enough to tell the status towards anyone
+        "relations": user_collections(
+            "friend", "friend_by", "requested_user", "requested_by", "blocked_user"
+        ),
+        "full": user_collections(
+            "friend",
+            "friend_by",
+            "requested_user",
+            "requested_by",
+            "blocked_user",
+            "blocked_by",
+        ),
+    }
 
     @classmethod
-    async def one_by_uid(cls, db: AsyncSession, uid: str, option: bool = True) -> User:
-        return (await cls(db, {"uid": uid}, option).get_data()).one_or_none()
+    async def one_by_uid(
+        cls, db: AsyncSession, uid: str, profile: str = "identity"
+    ) -> User:
+        return (await cls(db, {"uid": uid}, profile).get_data()).one_or_none()
 
 
 class NotificationQuery(Query[Notification]):
     data_model = Notification
+    load_profiles = {
+        "identity": IDENTITY,
+        # everything NotificationModel renders
+        "full": (
+            joinedload(Notification.sender_user).raiseload("*", sql_only=True),
+            joinedload(Notification.receiver_user).raiseload("*", sql_only=True),
+            joinedload(Notification.linked_notification).raiseload("*", sql_only=True),
+            *IDENTITY,
+        ),
+    }
 
     @classmethod
     def get_all_by_reciever_id(
         cls,
         db: AsyncSession,
         reciever_id: int,
-        option: bool = True,
+        profile: str = "identity",
         limit: int | None = None,
         offset: int | None = None,
         order_by: tuple[str, str] | None = None,
     ) -> Coroutine[any, any, Sequence[type[Notification]]]:
         return cls(
-            db, {"receiver_id": reciever_id}, option, limit, offset, order_by
+            db, {"receiver_id": reciever_id}, profile, limit, offset, order_by
         ).get_all_filter()
 
     async def get_by_jsonB_filter(self, jsonB_filter: dict, all: bool = False):
@@ -1,61 +1,136 @@
-import typing
+import hashlib
+import time
+from collections import OrderedDict
 
 from fastapi import HTTPException
-from starlette.authentication import (
-    AuthCredentials,
-    AuthenticationBackend,
-    BaseUser,
-)
+from fastapi.routing import APIRoute
+from starlette.authentication import AuthCredentials, AuthenticationBackend
 from starlette.requests import HTTPConnection
-from starlette.responses import JSONResponse
-from starlette.responses import Response
+from starlette.routing import Mount
 from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.services.auth import Token, check_account_status
 from app.api.v1.handlers.exceptions import TokenExpiredException
+from app.core.settings import CACHE, JWT
 
 
-class AuthenticationMiddleware:
+class VerifiedTokenCache:
+    """
+    Bounded LRU of sha256(token) -> decoded claims of tokens that passed verification,
+    so a token reused within its lifetime is only decoded once. An entry is dropped at
+    the token exp and decoded again, which then raises TokenExpiredException.
+
+    revoke_user() drops the cached tokens of a user and rejects the ones issued before
+    the revocation until they could have expired anyway.
+    """
+
     def __init__(
         self,
-        app: ASGIApp,
-        backend: AuthenticationBackend,
-        on_error: typing.Optional[
-            typing.Callable[[HTTPConnection, Exception], Response]
-        ] = None,
+        size: int = CACHE["TOKEN_SIZE"],
+        revoke_window: float = JWT["ACCESS_TOKEN_EXPIRES"].total_seconds(),
     ) -> None:
+        self.size = size
+        self.revoke_window = revoke_window
+        self.entries: OrderedDict[bytes, dict] = OrderedDict()
+        self.by_user: dict[int, set[bytes]] = {}
+        self.revoked: dict[int, float] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "revocations": 0}
+
+    def verify(self, token: str) -> dict | None:
+        """Decoded claims of the token, None once revoked"""
+        digest = hashlib.sha256(token.encode()).digest()
+        claims = self.entries.get(digest)
+        if claims is not None:
+            if claims["exp"] > time.time():
+                self.entries.move_to_end(digest)
+                self.stats["hits"] += 1
+                return claims
+            self._drop(digest)
+
+        self.stats["misses"] += 1
+        claims = Token.verify_token(token)
+        if self.is_revoked(claims):
+            return None
+        self._put(digest, claims)
+        return claims
+
+    def is_revoked(self, claims: dict) -> bool:
+        revoked_at = self.revoked.get(claims.get("id"))
+        if revoked_at is None:
+            return False
+        if revoked_at + self.revoke_window < time.time():
+            del self.revoked[claims["id"]]
+            return False
+        return claims.get("iat", 0) <= revoked_at
+
+    def revoke_user(self, user_id: int, revoked_at: float | None = None) -> None:
+        self.revoked[user_id] = time.time() if revoked_at is None else revoked_at
+        for digest in self.by_user.pop(user_id, ()):
+            self.entries.pop(digest, None)
+        self.stats["revocations"] += 1
+
+    def _put(self, digest: bytes, claims: dict) -> None:
+        self.entries[digest] = claims
+        self.by_user.setdefault(claims["id"], set()).add(digest)
+        while len(self.entries) > self.size:
+            self._drop(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def _drop(self, digest: bytes) -> None:
+        claims = self.entries.pop(digest)
+        digests = self.by_user.get(claims["id"])
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self.by_user[claims["id"]]
+
+
+token_cache = VerifiedTokenCache()
+
+
+def public_paths(app) -> tuple[frozenset[str], tuple[str, ...]]:
+    """Exact paths of the routes marked with @public and prefixes of mounted apps"""
+    exact = {app.docs_url, app.redoc_url, app.openapi_url}
+    if app.docs_url:
+        exact.add(f"{app.docs_url}/oauth2-redirect")
+    prefixes = []
+    for route in app.routes:
+        if isinstance(route, APIRoute) and getattr(route.endpoint, "is_public", False):
+            exact.add(route.path)
+        elif isinstance(route, Mount):
+            prefixes.append(f"{route.path}/")
+    return frozenset(path for path in exact if path), tuple(prefixes)
+
+
+class AuthenticationMiddleware:
+    """
+    Public routes and mounted static files are passed through with an anonymous user.
+    Everything else gets a LazyAuthUser, the Authorization header is only read and
+    verified once the handler touches request.user.
+    """
+
+    def __init__(self, app: ASGIApp, backend: "BearerTokenAuthBackend") -> None:
         self.app = app
         self.backend = backend
-        self.on_error: typing.Callable[[HTTPConnection, Exception], Response] = (
-            on_error if on_error is not None else self.default_on_error
-        )
+        self.public: tuple[frozenset[str], tuple[str, ...]] | None = None
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
 
-        conn = HTTPConnection(scope)
-        try:
-            auth_result = await self.backend.authenticate(conn)
-        except Exception as exc:
-            response = self.on_error(conn, exc)
-            await response(scope, receive, send)
-            return
-        if auth_result is None:
-            user = AuthUser(auth=False, token=AuthToken("not_available"))
-            auth_result = AuthCredentials(), user
-        if auth_result == "token_expired":
-            user = AuthUser(auth=False, token=AuthToken("expired"))
-            auth_result = AuthCredentials(), user
-
-        scope["auth"], scope["user"] = auth_result
+        if self.public is None:
+            # routes are all registered by the time the first request comes in
+            self.public = public_paths(scope["app"])
+        exact, prefixes = self.public
+        path = scope["path"]
+        scope["auth"] = NO_CREDENTIALS
+        if path in exact or path.startswith(prefixes):
+            scope["user"] = NOT_AVAILABLE_USER
+        else:
+            scope["user"] = LazyAuthUser(scope, self.backend)
         await self.app(scope, receive, send)
 
-    @staticmethod
-    def default_on_error(_, exc: Exception) -> Response:
-        return JSONResponse(str(exc), status_code=400)
-
 
 # Authentication Backend Class
 class BearerTokenAuthBackend(AuthenticationBackend):
@@ -66,47 +141,51 @@ class BearerTokenAuthBackend(AuthenticationBackend):
 
     async def authenticate(self, request):
         # This function is inherited from the base class and called by some other class
-        if "Authorization" not in request.headers:
-            return
+        return NO_CREDENTIALS, self.identify(request.headers.get("Authorization"))
+
+    def identify(self, auth: str | None) -> "AuthUser":
+        if auth is None:
+            return NOT_AVAILABLE_USER
 
-        auth = request.headers["Authorization"]
         try:
             scheme, token = auth.split()
             if scheme.lower() != "bearer":
-                return
-            decoded = Token.verify_token(token)
-            if decoded["type"] == "refresh":
-                return
+                return NOT_AVAILABLE_USER
+            decoded = token_cache.verify(token)
+            if decoded and decoded["type"] == "refresh":
+                return NOT_AVAILABLE_USER
         except TokenExpiredException:
-            return "token_expired"
+            return EXPIRED_USER
         except (ValueError, UnicodeDecodeError, HTTPException):
-            return None
+            return NOT_AVAILABLE_USER
 
         if decoded:
             check_account_status(decoded["is_active"])
-            user = AuthUser(
+            return AuthUser(
                 auth=True,
                 token=AuthToken("verified", token),
                 username=decoded["sub"],
                 user_id=decoded["id"],
                 is_superuser=decoded["is_superuser"],
             )
-        else:
-            user = AuthUser(auth=False, token=AuthToken("invalid", token))
-        return auth, user
+        return AuthUser(auth=False, token=AuthToken("invalid", token))
 
 
 class AuthToken:
-    token_status_fields = ["expired", "invalid", "verified", "not_available"]
+    __slots__ = ("token", "status")
+
+    token_status_fields = ("expired", "invalid", "verified", "not_available")
 
-    def __init__(self, tkn_status: str, token: typing.Optional[str] = None):
+    def __init__(self, tkn_status: str, token: str | None = None):
         self.token = token
         self.status = tkn_status
         if self.status not in self.token_status_fields:
             raise ValueError(f"Token status must be one of {self.token_status_fields}")
 
 
-class AuthUser(BaseUser):
+class AuthUser:
+    __slots__ = ("_auth", "token", "id", "username", "is_superuser")
+
     def __init__(
         self,
         auth: bool,
@@ -124,3 +203,39 @@ class AuthUser(BaseUser):
     @property
     def is_authenticated(self):
         return self._auth
+
+    @property
+    def display_name(self) -> str:
+        return self.username or ""
+
+    @property
+    def identity(self) -> str:
+        return str(self.id) if self.id is not None else ""
+
+
+class LazyAuthUser:
+    """
+    Stands in for the AuthUser of the request until an attribute is read. Errors of
+    the verification, like a blocked account, are raised inside the handler then.
+    """
+
+    __slots__ = ("scope", "backend", "user")
+
+    def __init__(self, scope: Scope, backend: BearerTokenAuthBackend) -> None:
+        self.scope = scope
+        self.backend = backend
+        self.user: AuthUser | None = None
+
+    def resolve(self) -> AuthUser:
+        if self.user is None:
+            auth = HTTPConnection(self.scope).headers.get("Authorization")
+            self.user = self.backend.identify(auth)
+        return self.user
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+
+NO_CREDENTIALS = AuthCredentials()
+NOT_AVAILABLE_USER = AuthUser(auth=False, token=AuthToken("not_available"))
+EXPIRED_USER = AuthUser(auth=False, token=AuthToken("expired"))
@@ -4,30 +4,21 @@ from typing import cast
 from fastapi import WebSocketException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError, ExpiredSignatureError
-from passlib.context import CryptContext
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.postgres.models.user import User
+from app.extra.query import UserQuery
 from starlette import status
 
 from app.api.v1.handlers.exceptions import (
     TokenExpiredException,
     AccountBlockedException,
     AuthException,
-    InvalidTokenException,
     IncorrectCredentialsException,
 )
-from app.db.mango.models.token import (
-    OutstandingRefreshToken,
-    BlackListedRefreshToken,
-)
 from app.core.settings import JWT
-from odmantic.session import AIOSession
-from odmantic.exceptions import DocumentNotFoundError
-from odmantic import Model
+from .password import verify_and_update
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
@@ -37,20 +28,19 @@ def check_account_status(acc_status: bool):
 
 
 async def authenticate_user(db: AsyncSession, username: str, password: str):
-    query = select(User).where(User.username == username)
-    user = await db.scalar(query)
-    if not user or not bcrypt_context.verify(password, cast(str, user.hashed_password)):
+    user = await UserQuery(db, {"username": username}, "identity").get_one_filter()
+    if not user:
+        raise IncorrectCredentialsException()
+    valid, new_hash = await verify_and_update(password, cast(str, user.hashed_password))
+    if not valid:
         raise IncorrectCredentialsException()
+    if new_hash is not None:
+        # the configured bcrypt cost changed since this hash was made
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 
-async def token_document_delete(mango: AIOSession, document: Model):
-    try:
-        await mango.delete(document)
-    except DocumentNotFoundError:
-        raise InvalidTokenException()
-
-
 class Token:
     # must be field name of User model
     extra_encode_fields = [
@@ -72,12 +62,14 @@ class Token:
         }
 
     def get_encode_data(self, token_type: str):
+        now = datetime.now(tz=timezone.utc)
         encode = {
             "sub": self.user.username,
             "id": self.user.id,
             "type": token_type,
+            "iat": now,
             "exp": (
-                datetime.now(tz=timezone.utc)
+                now
                 + (
                     JWT["ACCESS_TOKEN_EXPIRES"]
                     if token_type == "access"
@@ -111,72 +103,6 @@ class Token:
         except JWTError:
             raise AuthException()
 
-    @staticmethod
-    async def verify_refresh_token(mangodb: AIOSession, token: str):
-        refresh_token = Token.verify_token(token)
-        if refresh_token["type"] == "access":
-            raise InvalidTokenException()
-
-        outstanding_token = await mangodb.find_one(
-            OutstandingRefreshToken, OutstandingRefreshToken.token == token
-        )
-        if outstanding_token is None:
-            raise InvalidTokenException()
-
-        blacklisted_token = await mangodb.find_one(
-            BlackListedRefreshToken, BlackListedRefreshToken.token == token
-        )
-        if blacklisted_token:
-            raise InvalidTokenException()
-
-        return refresh_token
-
-    @staticmethod
-    async def save_refresh_token_to_outstanding(
-        mangodb: AIOSession, token: str, user_id: int
-    ):
-        refresh_token = OutstandingRefreshToken(user_id=user_id, token=token)
-        await mangodb.save(refresh_token)
-
-    @staticmethod
-    async def save_refresh_token_to_blacklist(
-        mangodb: AIOSession, token: str, user_id: int
-    ):
-        outstanding = await mangodb.find_one(
-            OutstandingRefreshToken,
-            (OutstandingRefreshToken.user_id == user_id)
-            & (OutstandingRefreshToken.token == token),
-        )
-        if outstanding:
-            await token_document_delete(mangodb, outstanding)
-        else:
-            raise InvalidTokenException()
-
-        refresh_token = BlackListedRefreshToken(
-            token=token, user_id=user_id, expires_at=outstanding.expires_at
-        )
-        await mangodb.save(refresh_token)
-
-    @staticmethod
-    async def delete_all_tokens(mangodb: AIOSession, user_id: int):
-        outstanding_tokens = await mangodb.find(
-            OutstandingRefreshToken, OutstandingRefreshToken.user_id == user_id
-        )
-        for t in outstanding_tokens:
-            await token_document_delete(mangodb, t)
-
-        blacklisted_tokens = await mangodb.find(
-            BlackListedRefreshToken, BlackListedRefreshToken.user_id == user_id
-        )
-        for t in blacklisted_tokens:
-            await token_document_delete(mangodb, t)
-
-        return {
-            "user_id": user_id,
-            "deleted_outstanding_tokens": outstanding_tokens,
-            "deleted_black_token": blacklisted_tokens,
-        }
-
 
 def verify_ws_token(token: str):
     try:
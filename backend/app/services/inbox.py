@@ -0,0 +1,145 @@
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.db.mango.models.inbox import Inbox
+from app.db.mango.models.message import Message
+from app.db.mango.models.room import Room
+from app.db.mango.session import mango_sessionmanager
+from app.utils.date import utc_now
+from .room_cache import room_cache
+
+# Inbox documents are derived data: every write keeps them current incrementally and
+# `python -m app.cli inbox rebuild` recomputes them from the rooms and messages.
+
+
+def inbox_collection():
+    return mango_sessionmanager.engine.get_collection(Inbox)
+
+
+async def open_inbox(room: Room) -> None:
+    """Make sure every member of the room has an entry, e.g. for a new room"""
+    now = utc_now()
+    await inbox_collection().bulk_write(
+        [
+            UpdateOne(
+                {"user_id": usr.user_id, "room_id": str(room.id)},
+                {"$setOnInsert": {"last_activity": now, "unread": 0}},
+                upsert=True,
+            )
+            for usr in room.users
+        ],
+        ordered=False,
+    )
+
+
+async def record_messages(messages: list[Message]) -> None:
+    """Move the rooms of newly written messages to the top of their members' inbox"""
+    by_room: dict[str, list[Message]] = defaultdict(list)
+    for message in messages:
+        by_room[message.room_id].append(message)
+
+    updates = []
+    for room_id, room_messages in by_room.items():
+        entry = await room_cache.get(room_id)
+        if entry is None:
+            continue
+        # only members bump the room in the inbox of the others
+        room_messages = [
+            message for message in room_messages if message.sender_id in entry.members
+        ]
+        if not room_messages:
+            continue
+        last_message_id = max(message.id for message in room_messages)
+        last_activity = max(message.created_at for message in room_messages)
+        for member in entry.members:
+            unread = sum(1 for message in room_messages if message.sender_id != member)
+            updates.append(
+                UpdateOne(
+                    {"user_id": member, "room_id": room_id},
+                    {
+                        "$max": {
+                            "last_message_id": last_message_id,
+                            "last_activity": last_activity,
+                        },
+                        "$inc": {"unread": unread},
+                    },
+                    upsert=True,
+                )
+            )
+    if updates:
+        await inbox_collection().bulk_write(updates, ordered=False)
+
+
+async def mark_seen(room_id: str, reader_id: int, up_to: ObjectId) -> None:
+    # what the reader sent never counts, messages after up_to are still unread
+    unread = await mango_sessionmanager.engine.get_collection(Message).count_documents(
+        {"room_id": room_id, "_id": {"$gt": up_to}, "sender_id": {"$ne": reader_id}}
+    )
+    await inbox_collection().update_one(
+        {"user_id": reader_id, "room_id": room_id}, {"$set": {"unread": unread}}
+    )
+
+
+async def get_inbox(
+    user_id: int, limit: int, after: tuple[datetime, ObjectId] | None = None
+) -> list[Inbox]:
+    """
+    Entries most recent first. ``after`` is the (last_activity, id) of the last entry
+    of the previous page.
+    """
+    query: dict = {"user_id": user_id}
+    if after is not None:
+        last_activity, entry_id = after
+        query["$or"] = [
+            {"last_activity": {"$lt": last_activity}},
+            {"last_activity": last_activity, "_id": {"$lt": entry_id}},
+        ]
+    return await mango_sessionmanager.engine.find(
+        Inbox,
+        query,
+        sort=(Inbox.last_activity.desc(), Inbox.id.desc()),
+        limit=limit,
+    )
+
+
+async def rebuild_inbox() -> int:
+    """Recompute every inbox document, returns the number of entries written"""
+    engine = mango_sessionmanager.engine
+    messages = engine.get_collection(Message)
+    written = 0
+    async for room in engine.find(Room):
+        room_id = str(room.id)
+        last = await messages.find_one({"room_id": room_id}, sort=[("_id", -1)])
+        if last is None:
+            last_activity = room.id.generation_time
+        else:
+            last_activity = last["_id"].generation_time
+        updates = []
+        for usr in room.users:
+            unread = await messages.count_documents(
+                {
+                    "room_id": room_id,
+                    "sender_id": {"$ne": usr.user_id},
+                    "status": {"$ne": "seen"},
+                }
+            )
+            updates.append(
+                UpdateOne(
+                    {"user_id": usr.user_id, "room_id": room_id},
+                    {
+                        "$set": {
+                            "last_message_id": last["_id"] if last else None,
+                            "last_activity": last_activity,
+                            "unread": unread,
+                        }
+                    },
+                    upsert=True,
+                )
+            )
+        if updates:
+            await inbox_collection().bulk_write(updates, ordered=False)
+            written += len(updates)
+    return written
@@ -1,33 +1,316 @@
+import asyncio
+import time
+from collections import Counter
 from typing import TypedDict
 
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 
+from app.core.logger import logger
+from app.core.settings import MESSAGE_PIPELINE
 from app.db.mango.session import mango_sessionmanager
-from app.db.mango.models.message import Message
+from app.db.mango.models.message import Message, valid_message_status
+from .inbox import record_messages, mark_seen
 
 
 NewMessageDataType = TypedDict(
     "NewMessageDataType", {"room_id": str, "message_text": str, "sender_id": int}
 )
 
+ROOM_SEQUENCE_COLLECTION = "room_sequence"
 
-async def save_new_message(msg: NewMessageDataType):
-    async with mango_sessionmanager.engine.session() as session:
-        new_message = Message(**msg)
-        return await session.save(new_message)
 
+def committed_seq(counter: dict | None) -> int:
+    """
+    Highest seq of the room below which every message is either stored or never
+    will be: the seq before the oldest range still being written. Messages above it
+    may be published ahead of a lower one, so clients resume from this watermark
+    rather than from the highest seq they received.
+    """
+    if counter is None:
+        return 0
+    cutoff = time.time() - MESSAGE_PIPELINE["RESERVATION_TIMEOUT"]
+    pending = [
+        reservation["first"]
+        for reservation in counter.get("pending", ())
+        if reservation["at"] > cutoff
+    ]
+    return min(pending) - 1 if pending else counter["seq"]
 
-async def change_msg_status(
-    msg_id_list: list[str],
-    msg_status: str,
-    sender_user_id: int,
-) -> list[Message]:
-    msg_object_id_list = [ObjectId(msg_id) for msg_id in msg_id_list]
-    async with mango_sessionmanager.engine.session() as session:
-        messages = await session.find(Message, {"_id": {"$in": msg_object_id_list}})
-        for msg in messages:
-            if msg.sender_id != sender_user_id:
-                msg.status = msg_status
-        await session.save_all(messages)
 
-        return messages
+def room_seq_collection():
+    return mango_sessionmanager.engine.database[ROOM_SEQUENCE_COLLECTION]
+
+
+async def reserve_room_seq(room_id: str, count: int) -> int:
+    """
+    Atomically reserve ``count`` sequence numbers of the room and record the range as
+    pending until release_room_seq(), returns the first
+    """
+    # an update pipeline, so the range is pending the moment the counter moves
+    seq = {"$add": [{"$ifNull": ["$seq", 0]}, count]}
+    reservation = {"first": {"$subtract": [seq, count - 1]}, "at": time.time()}
+    pending = {"$concatArrays": [{"$ifNull": ["$pending", []]}, [reservation]]}
+    counter = await room_seq_collection().find_one_and_update(
+        {"_id": room_id},
+        [{"$set": {"seq": seq, "pending": pending}}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["seq"] - count + 1
+
+
+async def release_room_seq(room_id: str, first: int) -> int:
+    """Mark a reserved range as written (or failed), returns the committed watermark"""
+    cutoff = time.time() - MESSAGE_PIPELINE["RESERVATION_TIMEOUT"]
+    counter = await room_seq_collection().find_one_and_update(
+        {"_id": room_id},
+        {"$pull": {"pending": {"$or": [{"first": first}, {"at": {"$lte": cutoff}}]}}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return committed_seq(counter)
+
+
+async def get_committed_seq(room_id: str) -> int:
+    return committed_seq(await room_seq_collection().find_one({"_id": room_id}))
+
+
+async def assign_room_seq(messages: list[Message]) -> dict[str, int]:
+    """Number the messages per room, returns the first seq reserved for each room"""
+    # one counter round trip per room of the batch, a failed write leaves a gap
+    counts = Counter(message.room_id for message in messages)
+    results = await asyncio.gather(
+        *(reserve_room_seq(room_id, count) for room_id, count in counts.items()),
+        return_exceptions=True,
+    )
+    firsts = {}
+    error = None
+    for room_id, result in zip(counts, results):
+        if isinstance(result, Exception):
+            error = error or result
+        else:
+            firsts[room_id] = result
+    if error is not None:
+        # the batch is not written, the ranges reserved must not hold anything back
+        await release_room_seqs(firsts)
+        raise error
+    next_seq = dict(firsts)
+    for message in messages:
+        message.seq = next_seq[message.room_id]
+        next_seq[message.room_id] += 1
+    return firsts
+
+
+async def release_room_seqs(firsts: dict[str, int]) -> dict[str, int]:
+    committed = await asyncio.gather(
+        *(release_room_seq(room_id, first) for room_id, first in firsts.items()),
+        return_exceptions=True,
+    )
+    watermarks = {}
+    for room_id, result in zip(firsts, committed):
+        if isinstance(result, Exception):
+            # the range stops holding the watermark back after RESERVATION_TIMEOUT
+            logger.exception(f"failed to release seq of room {room_id}: {result}")
+        else:
+            watermarks[room_id] = result
+    return watermarks
+
+
+async def get_messages_after(room_id: str, seq: int, limit: int) -> list[Message]:
+    return await mango_sessionmanager.engine.find(
+        Message,
+        {"room_id": room_id, "seq": {"$gt": seq}},
+        sort=Message.seq,
+        limit=limit,
+    )
+
+
+class MessageWritePipeline:
+    """
+    Group commit of new messages. Messages of every room are queued and written by a
+    single task with one ordered insert_many per batch, flushed once ``max_batch``
+    messages are queued or the oldest one waited ``max_delay`` seconds. Room sequence
+    numbers are reserved per batch right before the write and released right after
+    it. Each caller gets its message and the committed watermark of its room back
+    once the batch is acknowledged. Futures are resolved in submission order, so
+    callers that publish right after saving keep the room order.
+
+    Inbox entries of the written messages are updated by a second task, so the writer
+    never waits on them. Batches written meanwhile are merged into one inbox update.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = MESSAGE_PIPELINE["MAX_BATCH"],
+        max_delay: float = MESSAGE_PIPELINE["MAX_DELAY"],
+    ) -> None:
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending: list[tuple[Message, asyncio.Future]] = []
+        self.inbox_pending: list[Message] = []
+        self.stats = {
+            "batches": 0,
+            "messages": 0,
+            "failed": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._closing = False
+        self._task: asyncio.Task | None = None
+        self._inbox_ready = asyncio.Event()
+        self._inbox_closing = False
+        self._inbox_task: asyncio.Task | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.pending)
+
+    @property
+    def inbox_depth(self) -> int:
+        return len(self.inbox_pending)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+        if self._inbox_task is None:
+            self._inbox_closing = False
+            self._inbox_task = asyncio.create_task(self._record_inbox())
+
+    async def stop(self) -> None:
+        # writes whatever was accepted before shutdown
+        if self._task is None:
+            return
+        self._closing = True
+        self._has_pending.set()
+        self._batch_full.set()
+        await self._task
+        self._task = None
+        # then the inbox entries of everything written
+        self._inbox_closing = True
+        self._inbox_ready.set()
+        await self._inbox_task
+        self._inbox_task = None
+
+    async def submit(self, message: Message) -> tuple[Message, int]:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((message, future))
+        self._has_pending.set()
+        if len(self.pending) >= self.max_batch:
+            self._batch_full.set()
+        return await future
+
+    async def _run(self) -> None:
+        while not (self._closing and not self.pending):
+            await self._has_pending.wait()
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+
+    async def _flush(self) -> None:
+        batch = self.pending[: self.max_batch]
+        del self.pending[: self.max_batch]
+        if len(self.pending) < self.max_batch and not self._closing:
+            self._batch_full.clear()
+        if not self.pending and not self._closing:
+            self._has_pending.clear()
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        collection = mango_sessionmanager.engine.get_collection(Message)
+        written = len(batch)
+        error = None
+        firsts = {}
+        try:
+            firsts = await assign_room_seq([message for message, _ in batch])
+            await collection.insert_many(
+                [message.model_dump_doc() for message, _ in batch], ordered=True
+            )
+        except BulkWriteError as exc:
+            # an ordered insert stops at the first failure, earlier ones are stored
+            written = exc.details.get("nInserted", 0)
+            error = exc
+        except Exception as exc:
+            written = 0
+            error = exc
+        # failed messages are never stored, their seqs no longer hold anything back
+        watermarks = await release_room_seqs(firsts)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stats["batches"] += 1
+        self.stats["messages"] += written
+        self.stats["failed"] += len(batch) - written
+        self.stats["last_batch_size"] = len(batch)
+        self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+        self.stats["last_flush_ms"] = round(elapsed, 3)
+        self.stats["total_flush_ms"] = round(self.stats["total_flush_ms"] + elapsed, 3)
+        if error is not None:
+            logger.exception(
+                f"failed to write {len(batch) - written} messages: {error}"
+            )
+
+        for index, (message, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index < written:
+                # a lower watermark than the real one only makes a resume replay more
+                future.set_result((message, watermarks.get(message.room_id, 0)))
+            else:
+                future.set_exception(error)
+
+        if written:
+            self.inbox_pending.extend(message for message, _ in batch[:written])
+            self._inbox_ready.set()
+
+    async def _record_inbox(self) -> None:
+        while not (self._inbox_closing and not self.inbox_pending):
+            await self._inbox_ready.wait()
+            self._inbox_ready.clear()
+            messages, self.inbox_pending = self.inbox_pending, []
+            if not messages:
+                continue
+            try:
+                await record_messages(messages)
+            except Exception as exc:
+                logger.exception(f"failed to update inbox: {exc}")
+
+
+message_pipeline = MessageWritePipeline()
+
+
+async def save_new_message(msg: NewMessageDataType) -> tuple[Message, int]:
+    """The saved message and the committed watermark of its room"""
+    return await message_pipeline.submit(Message(**msg))
+
+
+async def apply_receipt(
+    room_id: str, reader_id: int, up_to: ObjectId, msg_status: str
+) -> list[int]:
+    """
+    Upgrade the status of every message of the room up to ``up_to`` that was not sent
+    by the reader. Status only moves forward (sent -> delivered -> seen), so a late
+    "delivered" never overwrites "seen". Returns the senders whose messages changed.
+    """
+    lower_status = valid_message_status[: valid_message_status.index(msg_status)]
+    query = {
+        "room_id": room_id,
+        "_id": {"$lte": up_to},
+        "sender_id": {"$ne": reader_id},
+        "status": {"$in": lower_status},
+    }
+    collection = mango_sessionmanager.engine.get_collection(Message)
+    senders = await collection.distinct("sender_id", query)
+    if senders:
+        await collection.update_many(query, {"$set": {"status": msg_status}})
+    if msg_status == "seen":
+        await mark_seen(room_id, reader_id, up_to)
+    return senders
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from passlib.context import CryptContext
+
+from app.api.v1.handlers.exceptions import TooManyRequestsException
+from app.core.settings import PASSWORD
+
+T = TypeVar("T")
+
+# bcrypt releases the GIL, so a small thread pool keeps the event loop responsive
+# while hashing. Pinning min/max rounds makes every hash of another cost need an
+# update, upwards or downwards.
+rounds = PASSWORD["BCRYPT_ROUNDS"]
+password_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=rounds,
+    bcrypt__min_rounds=rounds,
+    bcrypt__max_rounds=rounds,
+)
+
+# in_flight counts the calls awaited on the loop, waiting for a worker or running
+password_stats = {
+    "in_flight": 0,
+    "completed": 0,
+    "rejected": 0,
+    "rehashed": 0,
+    "total_ms": 0.0,
+}
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        workers: int = PASSWORD["WORKERS"],
+        max_queue: int = PASSWORD["MAX_QUEUE"],
+    ) -> None:
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="password")
+        self.max_queue = max_queue
+
+    @staticmethod
+    def _timed(fn: Callable[..., T], *args) -> tuple[T, float]:
+        # runs in a worker, the stats are only touched on the loop
+        started = time.perf_counter()
+        result = fn(*args)
+        return result, (time.perf_counter() - started) * 1000
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if password_stats["in_flight"] >= self.max_queue:
+            password_stats["rejected"] += 1
+            raise TooManyRequestsException(retry_after=1)
+        password_stats["in_flight"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            result, elapsed = await loop.run_in_executor(
+                self.executor, self._timed, fn, *args
+            )
+        finally:
+            password_stats["in_flight"] -= 1
+        password_stats["completed"] += 1
+        password_stats["total_ms"] = round(password_stats["total_ms"] + elapsed, 3)
+        return result
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.run(password_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(password_context.verify, password, hashed_password)
+
+
+async def verify_and_update(
+    password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Verify the password, with a new hash when the stored one has another cost"""
+    valid, new_hash = await password_hasher.run(
+        password_context.verify_and_update, password, hashed_password
+    )
+    if new_hash is not None:
+        password_stats["rehashed"] += 1
+    return valid, new_hash
@@ -0,0 +1,290 @@
+import asyncio
+import contextlib
+import os
+import struct
+import tempfile
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable
+
+from sqlalchemy import select
+
+from app.api.v1.schemas.websocket import PresenceChange, WebSocketResponse
+from app.core.logger import logger
+from app.core.settings import PRESENCE
+from app.db.postgres.models.user import Friend
+from app.db.postgres.session import sessionmanager
+from .websocket.dispatch import publish_to_users
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows runs a single worker
+    fcntl = None
+
+# user_id, open connections, last seen (unix time)
+SLOT = struct.Struct("<qid")
+# user_id of a slot never used and of a slot freed by forget()
+EMPTY = 0
+TOMBSTONE = -1
+
+
+class PresenceTable:
+    """
+    Open addressing hash table of user presence living in shared memory, so every
+    uvicorn worker of the host reads and writes the same state. Writers take an
+    exclusive flock, readers a shared one, and waiting for it raises TimeoutError
+    after ``PRESENCE["LOCK_TIMEOUT"]`` seconds.
+
+    A user is online while it has connections and its row was refreshed within
+    ``stale_after`` seconds; each worker periodically refreshes the users it holds,
+    so rows left behind by a crashed worker expire on their own.
+
+    Rows offline for longer than ``stale_after`` are reused by inserts and dropped by
+    sweep(), which rehashes the table so probes never walk past dead rows.
+    """
+
+    def __init__(self, name: str, capacity: int, stale_after: float) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.stale_after = stale_after
+        self._shm: SharedMemory | None = None
+        self._lock_fd: int | None = None
+
+    @property
+    def buf(self) -> memoryview:
+        if self._shm is None:
+            self._open()
+        return self._shm.buf
+
+    def _open(self) -> None:
+        lock_path = os.path.join(tempfile.gettempdir(), f"{self.name}.lock")
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(exclusive=True):
+            try:
+                self._shm = SharedMemory(
+                    self.name, create=True, size=self.capacity * SLOT.size
+                )
+            except FileExistsError:
+                self._shm = SharedMemory(self.name)
+        # the table outlives any single worker, never unlink it on process exit
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool):
+        if fcntl is None or self._lock_fd is None:
+            yield
+            return
+        # every holder only touches the mapped memory, but a stalled worker could
+        # keep the lock, so the event loop never blocks on it for more than
+        # LOCK_TIMEOUT seconds
+        operation = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB
+        deadline = time.monotonic() + PRESENCE["LOCK_TIMEOUT"]
+        while True:
+            try:
+                fcntl.flock(self._lock_fd, operation)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("presence table lock is busy")
+                time.sleep(0.001)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _find(self, user_id: int, insert: bool) -> int | None:
+        buf = self.buf
+        now = time.time()
+        index = (user_id * 2654435761) % self.capacity
+        free = None
+        for _ in range(self.capacity):
+            slot_user, _, last_seen = SLOT.unpack_from(buf, index * SLOT.size)
+            if slot_user == user_id:
+                return index
+            if slot_user == EMPTY:
+                if free is None:
+                    free = index
+                break
+            if free is None and (
+                slot_user == TOMBSTONE or self._is_dead(last_seen, now)
+            ):
+                free = index
+            index = (index + 1) % self.capacity
+        if not insert:
+            return None
+        if free is None:
+            logger.warning("presence table is full, raise PRESENCE['CAPACITY']")
+            return None
+        SLOT.pack_into(buf, free * SLOT.size, user_id, 0, 0.0)
+        return free
+
+    def _is_online(self, connections: int, last_seen: float, now: float) -> bool:
+        return connections > 0 and now - last_seen < self.stale_after
+
+    def _is_dead(self, last_seen: float, now: float) -> bool:
+        # offline for longer than stale_after, the row can be given to another user
+        return now - last_seen >= self.stale_after
+
+    def connect(self, user_id: int) -> bool:
+        """Count a new connection, returns True when the user just came online"""
+        buf = self.buf
+        now = time.time()
+        with self._locked(exclusive=True):
+            index = self._find(user_id, insert=True)
+            if index is None:
+                return False
+            _, connections, last_seen = SLOT.unpack_from(buf, index * SLOT.size)
+            was_online = self._is_online(connections, last_seen, now)
+            connections = connections + 1 if was_online else 1
+            SLOT.pack_into(buf, index * SLOT.size, user_id, connections, now)
+        return not was_online
+
+    def disconnect(self, user_id: int) -> bool:
+        """Drop a connection, returns True when the user just went offline"""
+        buf = self.buf
+        with self._locked(exclusive=True):
+            index = self._find(user_id, insert=False)
+            if index is None:
+                return False
+            _, connections, _ = SLOT.unpack_from(buf, index * SLOT.size)
+            connections = max(connections - 1, 0)
+            SLOT.pack_into(buf, index * SLOT.size, user_id, connections, time.time())
+        return connections == 0
+
+    def refresh(self, user_ids: Iterable[int]) -> None:
+        buf = self.buf
+        now = time.time()
+        with self._locked(exclusive=True):
+            for user_id in user_ids:
+                # a row swept while this worker stalled is put back
+                index = self._find(user_id, insert=True)
+                if index is not None:
+                    _, connections, _ = SLOT.unpack_from(buf, index * SLOT.size)
+                    connections = max(connections, 1)
+                    SLOT.pack_into(buf, index * SLOT.size, user_id, connections, now)
+
+    def forget(self, user_id: int) -> None:
+        buf = self.buf
+        with self._locked(exclusive=True):
+            index = self._find(user_id, insert=False)
+            if index is not None:
+                # a tombstone keeps the probe chains running through this slot intact
+                SLOT.pack_into(buf, index * SLOT.size, TOMBSTONE, 0, 0.0)
+
+    def sweep(self) -> int:
+        """Drop tombstones and dead rows and rehash the rest, returns the rows freed"""
+        buf = self.buf
+        with self._locked(exclusive=True):
+            now = time.time()
+            rows = [row for row in SLOT.iter_unpack(buf) if row[0] != EMPTY]
+            keep = [
+                row
+                for row in rows
+                if row[0] != TOMBSTONE and not self._is_dead(row[2], now)
+            ]
+            if len(keep) == len(rows):
+                return 0
+            buf[:] = bytes(len(buf))
+            for user_id, connections, last_seen in keep:
+                index = self._find(user_id, insert=True)
+                SLOT.pack_into(buf, index * SLOT.size, user_id, connections, last_seen)
+        return len(rows) - len(keep)
+
+    def online(self, user_ids: Iterable[int]) -> set[int]:
+        return {
+            user_id
+            for user_id, (is_online, _) in self.lookup(user_ids).items()
+            if is_online
+        }
+
+    def lookup(self, user_ids: Iterable[int]) -> dict[int, tuple[bool, float | None]]:
+        """Batch read of (is_online, last_seen) for the given users"""
+        buf = self.buf
+        now = time.time()
+        result = {}
+        with self._locked(exclusive=False):
+            for user_id in user_ids:
+                index = self._find(user_id, insert=False)
+                if index is None:
+                    result[user_id] = (False, None)
+                    continue
+                _, connections, last_seen = SLOT.unpack_from(buf, index * SLOT.size)
+                result[user_id] = (
+                    self._is_online(connections, last_seen, now),
+                    last_seen,
+                )
+        return result
+
+
+presence_table = PresenceTable(
+    PRESENCE["SHM_NAME"], PRESENCE["CAPACITY"], PRESENCE["STALE_AFTER"]
+)
+
+
+async def get_friend_ids(user_id: int) -> list[int]:
+    query = (
+        select(Friend.friend_user_id)
+        .where(Friend.user_id == user_id)
+        .union(select(Friend.user_id).where(Friend.friend_user_id == user_id))
+    )
+    async with sessionmanager.session() as session:
+        return list((await session.scalars(query)).all())
+
+
+async def publish_presence(user_id: int, is_online: bool) -> None:
+    try:
+        friend_ids = await get_friend_ids(user_id)
+    except Exception as exc:
+        logger.exception(f"failed to load friends of user {user_id}: {exc}")
+        return
+    change = PresenceChange(user_id=user_id, is_online=is_online, last_seen=time.time())
+    response = WebSocketResponse(event_type="presence", data=[change])
+    await publish_to_users(friend_ids, response, key=f"presence:{user_id}")
+
+
+async def user_connected(user_id: int) -> None:
+    try:
+        came_online = presence_table.connect(user_id)
+    except TimeoutError as exc:
+        # the next refresh puts the row back
+        logger.warning(f"presence of user {user_id} not recorded: {exc}")
+        return
+    if came_online:
+        await publish_presence(user_id, True)
+
+
+async def user_disconnected(user_id: int) -> None:
+    try:
+        went_offline = presence_table.disconnect(user_id)
+    except TimeoutError as exc:
+        # the row is no longer refreshed by this worker and goes stale
+        logger.warning(f"presence of user {user_id} not released: {exc}")
+        return
+    if went_offline:
+        await publish_presence(user_id, False)
+
+
+async def refresh_presence(get_user_ids) -> None:
+    # keeps the rows of the users connected to this worker from going stale and
+    # periodically frees the rows of users gone for good
+    last_sweep = time.monotonic()
+    while True:
+        await asyncio.sleep(PRESENCE["REFRESH"])
+        try:
+            presence_table.refresh(list(get_user_ids()))
+            if time.monotonic() - last_sweep >= PRESENCE["SWEEP"]:
+                last_sweep = time.monotonic()
+                freed = presence_table.sweep()
+                if freed:
+                    logger.info(f"presence sweep freed {freed} rows")
+        except Exception as exc:
+            logger.exception(f"presence refresh failed: {exc}")
@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+from app.core.settings import RATE_LIMIT
+
+ratelimit_stats = {"allowed": 0, "throttled": {}}
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> float:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def retry_after(self, cost: float = 1) -> float:
+        return max(cost - self.tokens, 0) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets of one scope (connection, user, room...) created on demand per key,
+    in least recently used order. Once the limiter reaches ``max_keys``, buckets that
+    refilled completely are pruned, since they hold no state worth keeping. Then the
+    least recently used ones are evicted down to three quarters of ``max_keys``, so
+    the full scan runs at most once every ``max_keys // 4`` new keys.
+    """
+
+    def __init__(
+        self, name: str, rate: float, burst: float, max_keys: int = 10_000
+    ) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+        ratelimit_stats["throttled"][name] = 0
+
+    @classmethod
+    def from_settings(cls, name: str) -> "RateLimiter":
+        config = RATE_LIMIT[name.upper()]
+        return cls(name, config["RATE"], config["BURST"])
+
+    def bucket(self, key: Hashable) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self.prune()
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    def new_bucket(self) -> TokenBucket:
+        # unkeyed bucket owned by the caller, e.g. one per websocket
+        return TokenBucket(self.rate, self.burst)
+
+    def prune(self) -> None:
+        now = time.monotonic()
+        self.buckets = OrderedDict(
+            (key, bucket)
+            for key, bucket in self.buckets.items()
+            if bucket.refill(now) < bucket.burst
+        )
+        low_water = self.max_keys * 3 // 4
+        while len(self.buckets) > low_water:
+            self.buckets.popitem(last=False)
+
+
+def take(limits: list[tuple[RateLimiter, TokenBucket]], cost: float = 1) -> float:
+    """
+    Take ``cost`` tokens from every bucket or from none of them. Returns 0 when
+    allowed, otherwise the seconds to wait before the most restrictive bucket allows.
+    """
+    now = time.monotonic()
+    retry_after = 0.0
+    limited_by = None
+    for limiter, bucket in limits:
+        if bucket.refill(now) < cost:
+            wait = bucket.retry_after(cost)
+            if wait > retry_after:
+                retry_after, limited_by = wait, limiter
+    if limited_by is not None:
+        ratelimit_stats["throttled"][limited_by.name] += 1
+        return retry_after
+
+    for _, bucket in limits:
+        bucket.tokens -= cost
+    ratelimit_stats["allowed"] += 1
+    return 0.0
+
+
+ws_connection_limiter = RateLimiter.from_settings("ws_connection")
+ws_user_limiter = RateLimiter.from_settings("ws_user")
+ws_room_limiter = RateLimiter.from_settings("ws_room")
+relationship_limiter = RateLimiter.from_settings("relationship")
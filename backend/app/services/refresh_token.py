@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+from collections import Counter
+
+from odmantic.session import AIOSession
+from pymongo import UpdateOne
+
+from app.api.v1.handlers.exceptions import InvalidTokenException
+from app.core.logger import logger
+from app.core.settings import REFRESH_TOKEN_FILTER
+from app.db.mango.models.token import (
+    BlackListedRefreshToken,
+    OutstandingRefreshToken,
+    RefreshTokenState,
+)
+from app.db.mango.session import mango_sessionmanager
+from app.utils.bloom import BloomFilter
+from app.utils.date import utc_now
+from .auth import Token
+
+# Refresh tokens are looked up by their sha256, never by the raw token. A token moves
+# from outstanding to blacklisted exactly once with an atomic find_one_and_update, so
+# two concurrent refreshes with the same token cannot both succeed. Every revoked hash
+# also goes into an in-process bloom filter (shared between workers through the
+# broker), verifying a token that is not in it needs no database round trip.
+
+OUTSTANDING = "outstanding"
+BLACKLISTED = "blacklisted"
+
+revoked_refresh_tokens = BloomFilter(
+    REFRESH_TOKEN_FILTER["BITS"], REFRESH_TOKEN_FILTER["HASHES"]
+)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def state_collection():
+    return mango_sessionmanager.engine.get_collection(RefreshTokenState)
+
+
+# filter being built by load_revoked_filter, revocations meanwhile go to both
+_rebuilding: BloomFilter | None = None
+
+
+def mark_revoked(token_hashes: list[str]) -> None:
+    for token_hash in token_hashes:
+        digest = bytes.fromhex(token_hash)
+        revoked_refresh_tokens.add(digest)
+        if _rebuilding is not None:
+            _rebuilding.add(digest)
+
+
+async def load_revoked_filter() -> int:
+    """Rebuild the filter from the revoked tokens that did not expire yet"""
+    global _rebuilding
+    _rebuilding = fresh = BloomFilter(
+        REFRESH_TOKEN_FILTER["BITS"], REFRESH_TOKEN_FILTER["HASHES"]
+    )
+    try:
+        query = {"state": BLACKLISTED, "expires_at": {"$gt": utc_now()}}
+        async for doc in state_collection().find(query, {"token_hash": 1}):
+            fresh.add(bytes.fromhex(doc["token_hash"]))
+    finally:
+        _rebuilding = None
+    # swapped in place, other modules hold a reference to the filter
+    revoked_refresh_tokens.array = fresh.array
+    revoked_refresh_tokens.count = fresh.count
+    return fresh.count
+
+
+async def sweep_expired_tokens() -> int:
+    # the TTL index removes them as well, this keeps the filter from only growing
+    result = await state_collection().delete_many({"expires_at": {"$lte": utc_now()}})
+    await load_revoked_filter()
+    return result.deleted_count
+
+
+async def sweep_refresh_tokens() -> None:
+    while True:
+        await asyncio.sleep(REFRESH_TOKEN_FILTER["SWEEP"])
+        try:
+            await sweep_expired_tokens()
+        except Exception as exc:
+            logger.exception(f"refresh token sweep failed: {exc}")
+
+
+async def save_refresh_token(mangodb: AIOSession, token: str, user_id: int) -> None:
+    await mangodb.save(RefreshTokenState(token_hash=hash_token(token), user_id=user_id))
+
+
+async def verify_refresh_token(mangodb: AIOSession, token: str) -> tuple[dict, str]:
+    """Claims and hash of a refresh token that was not revoked"""
+    claims = Token.verify_token(token)
+    if claims["type"] == "access":
+        raise InvalidTokenException()
+
+    token_hash = hash_token(token)
+    if bytes.fromhex(token_hash) in revoked_refresh_tokens:
+        # revoked or a false positive of the filter, the database decides
+        outstanding = await mangodb.find_one(
+            RefreshTokenState,
+            (RefreshTokenState.token_hash == token_hash)
+            & (RefreshTokenState.state == OUTSTANDING),
+        )
+        if outstanding is None:
+            raise InvalidTokenException()
+    return claims, token_hash
+
+
+async def revoke_refresh_token(token_hash: str, user_id: int) -> None:
+    revoked = await state_collection().find_one_and_update(
+        {"token_hash": token_hash, "user_id": user_id, "state": OUTSTANDING},
+        {"$set": {"state": BLACKLISTED, "revoked_at": utc_now()}},
+        projection={"_id": 1},
+    )
+    if revoked is None:
+        raise InvalidTokenException()
+    mark_revoked([token_hash])
+
+
+async def delete_all_tokens(user_id: int) -> tuple[dict, list[str]]:
+    """Delete every refresh token of the user, returns the counts and revoked hashes"""
+    engine = mango_sessionmanager.engine
+    collection = state_collection()
+    query = {"user_id": user_id, "state": {"$in": [OUTSTANDING, BLACKLISTED]}}
+    # delete_many only reports a total, the per-state counts and the hashes to
+    # revoke come from one projected read of the same documents
+    counts = Counter()
+    revoked = []
+    async for doc in collection.find(query, {"_id": 0, "token_hash": 1, "state": 1}):
+        counts[doc["state"]] += 1
+        if doc["state"] == OUTSTANDING:
+            revoked.append(doc["token_hash"])
+    await collection.delete_many(query)
+    # so a later `tokens migrate` does not bring them back
+    legacy = 0
+    for model in (OutstandingRefreshToken, BlackListedRefreshToken):
+        result = await engine.get_collection(model).delete_many({"user_id": user_id})
+        legacy += result.deleted_count
+    mark_revoked(revoked)
+    data = {
+        "user_id": user_id,
+        "deleted_outstanding_tokens": counts[OUTSTANDING],
+        "deleted_black_token": counts[BLACKLISTED],
+        "deleted_legacy_tokens": legacy,
+    }
+    return data, revoked
+
+
+async def migrate_legacy_tokens() -> dict[str, int]:
+    """Copy the raw token collections into refresh_token_state, safe to run again"""
+    engine = mango_sessionmanager.engine
+    migrated = {}
+    for model, state in (
+        (OutstandingRefreshToken, OUTSTANDING),
+        (BlackListedRefreshToken, BLACKLISTED),
+    ):
+        updates = []
+        async for doc in engine.get_collection(model).find():
+            fields = {
+                "user_id": doc["user_id"],
+                "expires_at": doc["expires_at"],
+                "created_at": doc.get("created_at", doc["_id"].generation_time),
+            }
+            if state == OUTSTANDING:
+                # never undo a revocation made since the last run
+                update = {"$setOnInsert": {**fields, "state": OUTSTANDING}}
+            else:
+                update = {
+                    "$set": {"state": BLACKLISTED, "revoked_at": doc["blacklisted_at"]},
+                    "$setOnInsert": fields,
+                }
+            updates.append(
+                UpdateOne({"token_hash": hash_token(doc["token"])}, update, upsert=True)
+            )
+        if updates:
+            await state_collection().bulk_write(updates, ordered=False)
+        migrated[state] = len(updates)
+    return migrated
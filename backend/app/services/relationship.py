@@ -0,0 +1,146 @@
+import enum
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    exists,
+    insert,
+    literal,
+    or_,
+    select,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.db.postgres.models.user import BlockedUser, Friend, RequestedUser, User
+from app.extra.query import UserQuery
+
+
+class Relation(enum.Flag):
+    """What links user A to user B, seen from A"""
+
+    NONE = 0
+    FRIEND = enum.auto()
+    # A sent B a friend request
+    REQUESTED = enum.auto()
+    # B sent A a friend request
+    REQUESTED_BY = enum.auto()
+    # A blocked B
+    BLOCKED = enum.auto()
+    # B blocked A
+    BLOCKED_BY = enum.auto()
+
+
+def _edge(table, column: str, user_id, other_id):
+    return and_(table.user_id == user_id, getattr(table, column) == other_id)
+
+
+def relation_query(user_id: int, other_id: int):
+    # one branch per edge, each an index lookup on (user_id, <other>_id)
+    branches = [
+        (Relation.FRIEND, Friend, "friend_user_id", user_id, other_id),
+        (Relation.FRIEND, Friend, "friend_user_id", other_id, user_id),
+        (Relation.REQUESTED, RequestedUser, "requested_user_id", user_id, other_id),
+        (Relation.REQUESTED_BY, RequestedUser, "requested_user_id", other_id, user_id),
+        (Relation.BLOCKED, BlockedUser, "blocked_user_id", user_id, other_id),
+        (Relation.BLOCKED_BY, BlockedUser, "blocked_user_id", other_id, user_id),
+    ]
+    return union_all(
+        *(
+            select(literal(relation.value)).where(
+                exists().where(_edge(table, column, left, right))
+            )
+            for relation, table, column, left, right in branches
+        )
+    )
+
+
+def friend_status_expression(user_id: int):
+    """friend_status of each selected User as seen by user_id, for /user/search/"""
+
+    def edge(table, column, outgoing=True):
+        left, right = (user_id, User.id) if outgoing else (User.id, user_id)
+        return exists().where(_edge(table, column, left, right))
+
+    return case(
+        (edge(Friend, "friend_user_id"), "friend"),
+        (edge(Friend, "friend_user_id", outgoing=False), "friend"),
+        (edge(RequestedUser, "requested_user_id"), "requested"),
+        (edge(RequestedUser, "requested_user_id", outgoing=False), "requested_by"),
+        (edge(BlockedUser, "blocked_user_id"), "blocked"),
+        else_="none",
+    )
+
+
+async def get_relation(db: AsyncSession, user_id: int, other_id: int) -> Relation:
+    relation = Relation.NONE
+    for value in (await db.scalars(relation_query(user_id, other_id))).all():
+        relation |= Relation(value)
+    return relation
+
+
+async def get_users_with_relation(
+    db: AsyncSession, main_user_id: int, second_user_id: int
+) -> tuple[User, User, Relation]:
+    users = await UserQuery.many(db, (main_user_id, second_user_id), "identity")
+    users = {user.id: user for user in users}
+    if main_user_id not in users or second_user_id not in users:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    relation = await get_relation(db, main_user_id, second_user_id)
+    return users[main_user_id], users[second_user_id], relation
+
+
+async def add_friend(db: AsyncSession, user_id: int, friend_user_id: int) -> None:
+    await db.execute(
+        insert(Friend).values(user_id=user_id, friend_user_id=friend_user_id)
+    )
+
+
+async def remove_friend(db: AsyncSession, user_id: int, friend_user_id: int) -> None:
+    # the friendship is stored in either direction
+    await db.execute(
+        delete(Friend).where(
+            or_(
+                _edge(Friend, "friend_user_id", user_id, friend_user_id),
+                _edge(Friend, "friend_user_id", friend_user_id, user_id),
+            )
+        )
+    )
+
+
+async def add_request(db: AsyncSession, user_id: int, requested_user_id: int) -> None:
+    await db.execute(
+        insert(RequestedUser).values(
+            user_id=user_id, requested_user_id=requested_user_id
+        )
+    )
+
+
+async def remove_request(
+    db: AsyncSession, user_id: int, requested_user_id: int
+) -> None:
+    await db.execute(
+        delete(RequestedUser).where(
+            _edge(RequestedUser, "requested_user_id", user_id, requested_user_id)
+        )
+    )
+
+
+async def add_block(db: AsyncSession, user_id: int, blocked_user_id: int) -> None:
+    await db.execute(
+        insert(BlockedUser).values(user_id=user_id, blocked_user_id=blocked_user_id)
+    )
+
+
+async def remove_block(db: AsyncSession, user_id: int, blocked_user_id: int) -> None:
+    await db.execute(
+        delete(BlockedUser).where(
+            _edge(BlockedUser, "blocked_user_id", user_id, blocked_user_id)
+        )
+    )
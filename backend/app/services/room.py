@@ -1,6 +1,15 @@
 from odmantic.session import AIOSession
 
 from app.db.mango.models.room import Room
+from .inbox import open_inbox
+from .room_cache import room_cache
+from .websocket.dispatch import publish_room_invalidate
+
+
+async def sync_room_cache(room: Room) -> None:
+    # refresh the local entry and drop the stale copies of the other workers
+    room_cache.put(room)
+    await publish_room_invalidate(str(room.id))
 
 
 async def create_room(
@@ -10,7 +19,6 @@ async def create_room(
     query = {"users.user_id": {"$all": room_users}}
     room = await mangodb.find_one(Room, query)
 
-
     if not room:
         new_room = Room(
             users=[
@@ -20,11 +28,14 @@ async def create_room(
             type=room_type,
             is_active=True,
         )
-        return await mangodb.save(new_room)
+        room = await mangodb.save(new_room)
+    else:
+        room.is_active = True
+        room = await mangodb.save(room)
 
-    room.is_active = True
-
-    return await mangodb.save(room)
+    await sync_room_cache(room)
+    await open_inbox(room)
+    return room
 
 
 async def change_room_status(
@@ -37,4 +48,5 @@ async def change_room_status(
         if room.is_active != status:
             room.is_active = status
             await mangodb.save(room)
+            await sync_room_cache(room)
     return room
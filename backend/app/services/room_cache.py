@@ -0,0 +1,103 @@
+import time
+import weakref
+from collections import OrderedDict
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.core.settings import CACHE
+from app.db.mango.models.room import Room
+from app.db.mango.session import mango_sessionmanager
+
+
+class RoomEntry:
+    """
+    Cached room document with its member set. Entries are refreshed in place so every
+    RoomManager holding one sees membership and is_active changes immediately.
+    """
+
+    __slots__ = ("room", "members", "is_active", "expires_at", "__weakref__")
+
+    def __init__(self, room: Room, ttl: float) -> None:
+        self.update(room, ttl)
+
+    def update(self, room: Room, ttl: float) -> None:
+        self.room = room
+        self.members = {usr.user_id for usr in room.users}
+        self.is_active = room.is_active
+        self.expires_at = time.monotonic() + ttl
+
+
+class RoomCache:
+    """
+    Bounded LRU of room id -> RoomEntry. An evicted entry that a live RoomManager
+    still holds stays reachable through a weak reference and is put back on its next
+    get, so its holders keep seeing the refreshes.
+    """
+
+    def __init__(
+        self, ttl: float = CACHE["ROOM_TTL"], size: int = CACHE["ROOM_SIZE"]
+    ) -> None:
+        self.ttl = ttl
+        self.size = size
+        self.entries: OrderedDict[str, RoomEntry] = OrderedDict()
+        self.evicted: weakref.WeakValueDictionary[str, RoomEntry] = (
+            weakref.WeakValueDictionary()
+        )
+
+    def _lookup(self, room_id: str) -> RoomEntry | None:
+        entry = self.entries.get(room_id)
+        if entry is None:
+            entry = self.evicted.pop(room_id, None)
+            if entry is None:
+                return None
+            self.entries[room_id] = entry
+            self._trim()
+        self.entries.move_to_end(room_id)
+        return entry
+
+    def _trim(self) -> None:
+        while len(self.entries) > self.size:
+            room_id, entry = self.entries.popitem(last=False)
+            self.evicted[room_id] = entry
+
+    async def get(self, room_id: str) -> RoomEntry | None:
+        entry = self._lookup(room_id)
+        if entry is not None and entry.expires_at > time.monotonic():
+            return entry
+
+        try:
+            room_object_id = ObjectId(room_id)
+        except InvalidId:
+            return None
+        async with mango_sessionmanager.engine.session() as mangodb:
+            room = await mangodb.find_one(Room, Room.id == room_object_id)
+
+        if room is None:
+            self.entries.pop(room_id, None)
+            self.evicted.pop(room_id, None)
+            return None
+        return self.put(room)
+
+    def put(self, room: Room) -> RoomEntry:
+        room_id = str(room.id)
+        entry = self._lookup(room_id)
+        if entry is None:
+            entry = self.entries[room_id] = RoomEntry(room, self.ttl)
+            self._trim()
+        else:
+            entry.update(room, self.ttl)
+        return entry
+
+    def invalidate(self, room_id: str) -> None:
+        # keep the entry object alive for its holders, it is reloaded on next get
+        entry = self.entries.get(room_id) or self.evicted.get(room_id)
+        if entry is not None:
+            entry.expires_at = 0
+
+    async def is_member(self, room_id: str, user_id: int) -> bool:
+        entry = await self.get(room_id)
+        return entry is not None and user_id in entry.members
+
+
+room_cache = RoomCache()
@@ -0,0 +1,98 @@
+from fastapi import HTTPException
+from sqlalchemy import Float, Integer, Select, and_, cast, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.schemas.user import FriendSearch
+from app.db.postgres.models.user import User
+from app.utils.cursor import decode_keyset, encode_keyset
+from .user import friend_search_query
+
+search_types = ("name", "uid", "contact")
+
+
+def name_rank(term: str):
+    # prefix matches first, then by how well the term matches a word of the name
+    prefix = cast(User.full_name.istartswith(term, autoescape=True), Integer)
+    return cast(prefix + func.word_similarity(term, User.full_name), Float)
+
+
+def filter_search(
+    stmt: Select, user_id: int, search_type: str, search: str
+) -> tuple[Select, list]:
+    """Applies the search and returns the keys its results are ordered by"""
+    if search == "" or search_type == "":
+        return stmt.where(User.id != user_id), []
+
+    if search_type == "uid":
+        return stmt.where(User.uid == search), []
+
+    if search_type == "contact":
+        try:
+            return stmt.where(User.contact_number == int(search)), []
+        except ValueError:
+            raise HTTPException(
+                detail="search word is not valid for contact number", status_code=400
+            )
+
+    # full_name %> term is word_similarity(term, full_name) above the pg_trgm
+    # threshold, it catches typos and "last first" order, ILIKE catches substrings
+    term = " ".join(search.split())
+    stmt = stmt.where(
+        or_(
+            User.full_name.icontains(term, autoescape=True),
+            User.full_name.op("%>")(term),
+        )
+    )
+    return stmt, [name_rank(term)]
+
+
+def after_cursor(ranks: list, values: list):
+    # rows ordered by rank desc then id asc, strictly after the cursor row
+    *rank_values, last_id = values
+    condition = User.id > last_id
+    for rank, value in reversed(list(zip(ranks, rank_values))):
+        condition = or_(rank < value, and_(rank == value, condition))
+    return condition
+
+
+async def search_users(
+    db: AsyncSession,
+    user_id: int,
+    search_type: str,
+    search: str,
+    limit: int,
+    cursor: str | None = None,
+) -> tuple[list[FriendSearch], str | None]:
+    """
+    Keyset pagination of the user search, best match first. The cursor holds the
+    sort keys of the last row of the previous page and is None after the last page.
+    """
+    stmt, ranks = filter_search(
+        friend_search_query(user_id), user_id, search_type, search
+    )
+
+    if cursor:
+        values = decode_keyset(cursor)
+        if (
+            values is None
+            or len(values) != len(ranks) + 1
+            or not all(
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                for value in values
+            )
+        ):
+            raise HTTPException(detail="invalid cursor", status_code=400)
+        stmt = stmt.where(after_cursor(ranks, values))
+
+    stmt = (
+        stmt.add_columns(*ranks, User.id)
+        .order_by(*(rank.desc() for rank in ranks), User.id)
+        .limit(limit + 1)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_keyset(list(rows[-1][1:])) if has_more else None
+    users = [FriendSearch.model_validate(row[0], from_attributes=True) for row in rows]
+    return users, next_cursor
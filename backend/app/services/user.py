@@ -1,16 +1,16 @@
-from typing import Type
-
 from fastapi import HTTPException
+from sqlalchemy import Select, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import with_expression
 from starlette import status
 
 from app.api.v1.schemas.user import CreateUserRequest, UpdateUserRequest
-from app.api.v1.schemas.user import FriendSearch
 from app.core.settings import SUPER_USER, STATIC
 from app.db.postgres.models.user import User
-from .auth import bcrypt_context
-from app.extra.query import UserQuery
+from app.extra.query import IDENTITY
+from .password import hash_password
+from .relationship import friend_status_expression
 
 integrity_error_fields = ["email", "username", "contact_number"]
 
@@ -39,7 +39,7 @@ async def create_user(postgres: AsyncSession, user_data: CreateUserRequest):
     user_model = User(**user)
 
     user_model.is_superuser = is_superuser
-    user_model.hashed_password = bcrypt_context.hash(password)
+    user_model.hashed_password = await hash_password(password)
     postgres.add(user_model)
 
     try:
@@ -65,7 +65,7 @@ async def update_user_data(
         if value is not None and key != "password":
             setattr(user, key, value)
         elif value is not None and key == "password":
-            user.hashed_password = bcrypt_context.hash(value)
+            user.hashed_password = await hash_password(value)
 
     try:
         await postgres.commit()
@@ -79,53 +79,8 @@ async def update_user_data(
     return user
 
 
-async def get_user_for_add(
-    postgres: AsyncSession, main_user_id: int, second_user_id: int, operation: str
-):
-    main_user = await UserQuery.one(postgres, main_user_id)
-    second_user = await UserQuery.one(postgres, second_user_id, False)
-    is_already_in_operation = False
-
-    if main_user is None or second_user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-
-    if operation == "unfriend":
-        if (
-            second_user not in main_user.friend
-            and second_user not in main_user.friend_by
-        ):
-            is_already_in_operation = True
-
-    elif operation == "friend":
-        if second_user in main_user.friend or second_user in main_user.friend_by:
-            is_already_in_operation = True
-
-    elif second_user in getattr(main_user, operation):
-        is_already_in_operation = True
-
-    return main_user, second_user, is_already_in_operation
-
-
-def get_friend_search_res(users: list[User], self_user: Type[User]):
-    response = []
-    for usr in users:
-        if usr in self_user.friend or usr in self_user.friend_by:
-            frnd_status = "friend"
-        elif usr in self_user.requested_user:
-            frnd_status = "requested"
-        elif usr in self_user.requested_by:
-            frnd_status = "requested_by"
-        elif usr in self_user.blocked_user:
-            frnd_status = "blocked"
-        else:
-            frnd_status = "none"
-
-        response.append(
-            FriendSearch(
-                **usr.__dict__,
-                friend_status=frnd_status,
-            )
-        )
-    return response
+def friend_search_query(user_id: int) -> Select:
+    return select(User).options(
+        *IDENTITY,
+        with_expression(User.friend_status, friend_status_expression(user_id)),
+    )
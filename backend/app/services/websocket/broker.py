@@ -0,0 +1,177 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable
+from urllib.parse import urlparse
+
+from app.core.logger import logger
+from app.core.settings import BROKER
+
+BrokerHandler = Callable[[bytes], Awaitable[None]]
+
+
+class Broker(ABC):
+    """
+    Carries websocket events between workers. Every worker subscribes with a handler
+    that fans the event out to its own local connections.
+    """
+
+    def __init__(self) -> None:
+        self.handler: BrokerHandler | None = None
+
+    async def start(self, handler: BrokerHandler) -> None:
+        self.handler = handler
+
+    @abstractmethod
+    async def publish(self, data: bytes) -> None:
+        pass
+
+    async def close(self) -> None:
+        self.handler = None
+
+    async def dispatch(self, data: bytes) -> None:
+        if self.handler is None:
+            return
+        try:
+            await self.handler(data)
+        except Exception as exc:
+            logger.exception(f"broker handler failed: {exc}")
+
+
+class InMemoryBroker(Broker):
+    """Single process broker, published events are delivered straight to the handler"""
+
+    async def publish(self, data: bytes) -> None:
+        await self.dispatch(data)
+
+
+class RedisBroker(Broker):
+    """
+    Minimal pub/sub client speaking the redis wire protocol (RESP) so it works with
+    redis, valkey, keydb or any other compatible server without extra dependencies.
+    """
+
+    reconnect_delay = (0.1, 0.5, 1, 2, 5)
+
+    def __init__(self, url: str, channel: str) -> None:
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = parsed.username
+        self.password = parsed.password
+        self.channel = channel.encode()
+        self._publisher: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self._publish_lock = asyncio.Lock()
+        self._subscriber: asyncio.Task | None = None
+
+    async def start(self, handler: BrokerHandler) -> None:
+        await super().start(handler)
+        self._publisher = await self._open()
+        subscribed = asyncio.Event()
+        self._subscriber = asyncio.create_task(self._subscribe(subscribed))
+        await subscribed.wait()
+
+    async def publish(self, data: bytes) -> None:
+        async with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = await self._open()
+                    reader, writer = self._publisher
+                    writer.write(encode_command(b"PUBLISH", self.channel, data))
+                    await writer.drain()
+                    await read_reply(reader)
+                    return
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    async def close(self) -> None:
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            self._subscriber = None
+        if self._publisher is not None:
+            self._publisher[1].close()
+            self._publisher = None
+        await super().close()
+
+    async def _open(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            auth = [b"AUTH", self.password.encode()]
+            if self.username:
+                auth.insert(1, self.username.encode())
+            writer.write(encode_command(*auth))
+            await writer.drain()
+            await read_reply(reader)
+        return reader, writer
+
+    async def _subscribe(self, subscribed: asyncio.Event) -> None:
+        attempt = 0
+        while True:
+            try:
+                reader, writer = await self._open()
+                try:
+                    writer.write(encode_command(b"SUBSCRIBE", self.channel))
+                    await writer.drain()
+                    await read_reply(reader)
+                    subscribed.set()
+                    attempt = 0
+                    while True:
+                        reply = await read_reply(reader)
+                        if isinstance(reply, list) and reply[0] == b"message":
+                            await self.dispatch(reply[2])
+                finally:
+                    writer.close()
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.IncompleteReadError, RedisError) as exc:
+                delay = self.reconnect_delay[
+                    min(attempt, len(self.reconnect_delay) - 1)
+                ]
+                attempt += 1
+                logger.warning(f"broker subscription lost ({exc}), retry in {delay}s")
+                await asyncio.sleep(delay)
+
+
+class RedisError(Exception):
+    pass
+
+
+def encode_command(*args: bytes) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readuntil(b"\r\n")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body
+    if kind == b"-":
+        raise RedisError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length == -1:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length == -1:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RedisError(f"unexpected reply {line!r}")
+
+
+def create_broker(url: str | None, channel: str) -> Broker:
+    if not url:
+        return InMemoryBroker()
+    return RedisBroker(url, channel)
+
+
+broker = create_broker(BROKER["URL"], BROKER["CHANNEL"])
@@ -1,3 +1,56 @@
-main_connections = {}
+from typing import Generic, Hashable, Iterator, TypeVar
 
-room_connections = {}
\ No newline at end of file
+K = TypeVar("K", bound=Hashable)
+C = TypeVar("C")
+
+
+class ConnectionRegistry(Generic[K, C]):
+    """
+    Maps a key (user id) to the live connections of each of its devices. Add and
+    remove never await, so they are atomic for the event loop, and removing one
+    device keeps the other sockets of the same user registered.
+    """
+
+    def __init__(self) -> None:
+        self._connections: dict[K, dict[str, C]] = {}
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._connections
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def add(self, key: K, device_id: str, con: C) -> C | None:
+        """Register a connection and return the one it replaced on the same device"""
+        devices = self._connections.setdefault(key, {})
+        replaced = devices.get(device_id)
+        devices[device_id] = con
+        return replaced
+
+    def remove(self, key: K, device_id: str, con: C) -> bool:
+        """Unregister a connection and return True when it was the last of its key"""
+        devices = self._connections.get(key)
+        if devices is None:
+            return True
+        if devices.get(device_id) is con:
+            del devices[device_id]
+        if not devices:
+            del self._connections[key]
+            return True
+        return False
+
+    def get(self, key: K) -> tuple[C, ...]:
+        devices = self._connections.get(key)
+        return tuple(devices.values()) if devices else ()
+
+    def keys(self):
+        return self._connections.keys()
+
+    def values(self) -> Iterator[C]:
+        for devices in list(self._connections.values()):
+            yield from list(devices.values())
+
+
+main_connections = ConnectionRegistry()
+
+room_connections = {}
@@ -1,5 +1,19 @@
+from typing import Generic, Hashable, Iterator, TypeVar
+
 from .main_manager import MainConnectionManager
 from .room_manager import RoomManager
 
-main_connections: dict[int, MainConnectionManager]
+K = TypeVar("K", bound=Hashable)
+C = TypeVar("C")
+
+class ConnectionRegistry(Generic[K, C]):
+    def __contains__(self, key: K) -> bool: ...
+    def __len__(self) -> int: ...
+    def add(self, key: K, device_id: str, con: C) -> C | None: ...
+    def remove(self, key: K, device_id: str, con: C) -> bool: ...
+    def get(self, key: K) -> tuple[C, ...]: ...
+    def keys(self): ...
+    def values(self) -> Iterator[C]: ...
+
+main_connections: ConnectionRegistry[int, MainConnectionManager]
 room_connections: dict[str, RoomManager]
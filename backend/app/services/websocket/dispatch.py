@@ -0,0 +1,122 @@
+import json
+import time
+from typing import Iterable
+from uuid import uuid4
+
+from app.api.v1.schemas.websocket import WebSocketResponse
+from app.middlewares.auth import token_cache
+from ..refresh_token import mark_revoked
+from ..room_cache import room_cache
+from .broker import broker
+from .connections import main_connections, room_connections
+from .frame import Frame
+
+# Every event is published as "<json header>\n<payload>" and fanned out to the local
+# connections of each worker by deliver() once the broker hands it back. Delivery
+# only enqueues on each connection outbox, it never waits for a socket write, and the
+# event is serialized once per worker into a Frame shared by all recipients.
+
+worker_id = uuid4().hex
+
+
+def pack(header: dict, payload: bytes = b"") -> bytes:
+    return json.dumps(header, separators=(",", ":")).encode() + b"\n" + payload
+
+
+def unpack(data: bytes) -> tuple[dict, bytes]:
+    header, _, payload = data.partition(b"\n")
+    return json.loads(header), payload
+
+
+async def publish_to_users(
+    user_ids: Iterable[int], msg: WebSocketResponse, key: str | None = None
+) -> None:
+    users = list(dict.fromkeys(user_ids))
+    if users:
+        payload = Frame.from_model(msg).json
+        header = {"kind": "users", "users": users, "key": key}
+        await broker.publish(pack(header, payload))
+
+
+async def publish_to_room(
+    room_id: str,
+    room_users: Iterable[int],
+    msg: WebSocketResponse,
+    key: str | None = None,
+    seq: int | None = None,
+) -> None:
+    payload = Frame.from_model(msg).json
+    header = {
+        "kind": "room",
+        "room": room_id,
+        "users": list(room_users),
+        "key": key,
+        "seq": seq,
+    }
+    await broker.publish(pack(header, payload))
+
+
+async def publish_room_close(room_id: str) -> None:
+    await broker.publish(pack({"kind": "room_close", "room": room_id}))
+
+
+async def publish_room_invalidate(room_id: str) -> None:
+    header = {"kind": "room_invalidate", "room": room_id, "origin": worker_id}
+    await broker.publish(pack(header))
+
+
+async def publish_token_revoke(user_id: int) -> None:
+    # every worker rejects the tokens issued before the same instant
+    header = {"kind": "token_revoke", "user": user_id, "at": time.time()}
+    await broker.publish(pack(header))
+
+
+async def publish_refresh_revoke(token_hashes: list[str]) -> None:
+    # the publishing worker added them to its filter already
+    if token_hashes:
+        header = {"kind": "refresh_revoke", "hashes": token_hashes, "origin": worker_id}
+        await broker.publish(pack(header))
+
+
+async def deliver(data: bytes) -> None:
+    header, payload = unpack(data)
+    kind = header["kind"]
+    key = header.get("key")
+
+    if kind == "users":
+        frame = Frame(payload)
+        for user_id in header["users"]:
+            for con in main_connections.get(user_id):
+                con.outbox.put(frame, key)
+
+    elif kind == "room":
+        frame = Frame(payload, header.get("seq"))
+        room = room_connections.get(header["room"])
+        connected_users = room.connected_users if room else ()
+
+        # send a msg to online user who not connected in room.
+        for user_id in header["users"]:
+            if user_id not in connected_users:
+                for con in main_connections.get(user_id):
+                    con.outbox.put(frame, key)
+
+        if room:
+            for outbox in connected_users.values():
+                outbox.put(frame, key)
+
+    elif kind == "room_close":
+        room = room_connections.get(header["room"])
+        if room:
+            await room.close_room()
+
+    elif kind == "room_invalidate":
+        # the publishing worker already holds the fresh document
+        if header["origin"] != worker_id:
+            room_cache.invalidate(header["room"])
+
+    elif kind == "token_revoke":
+        token_cache.revoke_user(header["user"], header["at"])
+
+    elif kind == "refresh_revoke":
+        if header["origin"] != worker_id:
+            mark_revoked(header["hashes"])
@@ -0,0 +1,47 @@
+import json
+
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+supported_encodings = ("json", "msgpack") if msgpack is not None else ("json",)
+
+
+class Frame:
+    """
+    Outbound websocket event encoded once and shared by every recipient. The JSON
+    bytes are the canonical form; the text and msgpack encodings are derived lazily
+    and cached, so a fan-out pays at most one encoding per wire format.
+    """
+
+    __slots__ = ("json", "seq", "_text", "_msgpack")
+
+    def __init__(self, data: bytes, seq: int | None = None) -> None:
+        self.json = data
+        # room sequence of the message carried, used to skip replayed messages
+        self.seq = seq
+        self._text: str | None = None
+        self._msgpack: bytes | None = None
+
+    @classmethod
+    def from_model(cls, model: BaseModel, seq: int | None = None) -> "Frame":
+        return cls(model.model_dump_json().encode(), seq)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.json.decode()
+        return self._text
+
+    @property
+    def msgpack(self) -> bytes:
+        if self._msgpack is None:
+            self._msgpack = msgpack.packb(json.loads(self.json))
+        return self._msgpack
+
+
+def negotiate_encoding(requested: str | None) -> str:
+    return requested if requested in supported_encodings else "json"
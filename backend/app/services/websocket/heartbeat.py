@@ -0,0 +1,114 @@
+import asyncio
+import math
+
+from starlette import status
+
+from app.core.logger import logger
+from app.core.settings import HEARTBEAT
+from .frame import Frame
+from .outbox import Outbox
+
+PING = Frame(b'{"event_type":"ping"}')
+PONG = "pong"
+
+heartbeat_stats = {"tracked": 0, "pings": 0, "reaped": 0}
+
+
+class Heartbeat:
+    __slots__ = ("outbox", "last_seen", "pinged", "active")
+
+    def __init__(self, outbox: Outbox, now: float) -> None:
+        self.outbox = outbox
+        self.last_seen = now
+        self.pinged = False
+        self.active = True
+
+    def touch(self) -> None:
+        # only records the time, the wheel reschedules lazily when the slot fires
+        self.last_seen = asyncio.get_running_loop().time()
+        self.pinged = False
+
+
+class HeartbeatWheel:
+    """
+    Hashed timing wheel driving the heartbeat of every websocket of the worker from
+    a single task. Each tick only visits the connections due in the current slot: a
+    connection idle for ``interval`` seconds gets a ping, one idle for ``timeout``
+    seconds is closed and left for its endpoint loop to clean up.
+    """
+
+    def __init__(
+        self,
+        interval: float = HEARTBEAT["INTERVAL"],
+        timeout: float = HEARTBEAT["TIMEOUT"],
+        tick: float = HEARTBEAT["TICK"],
+    ) -> None:
+        self.interval = interval
+        self.timeout = timeout
+        self.tick = tick
+        self.slots: list[set[Heartbeat]] = [
+            set() for _ in range(math.ceil(max(interval, timeout) / tick) + 1)
+        ]
+        self.cursor = 0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def register(self, outbox: Outbox) -> Heartbeat:
+        beat = Heartbeat(outbox, asyncio.get_running_loop().time())
+        self._schedule(beat, self.interval)
+        heartbeat_stats["tracked"] += 1
+        return beat
+
+    def unregister(self, beat: Heartbeat) -> None:
+        if beat.active:
+            beat.active = False
+            heartbeat_stats["tracked"] -= 1
+
+    def _schedule(self, beat: Heartbeat, delay: float) -> None:
+        ticks = min(max(math.ceil(delay / self.tick), 1), len(self.slots) - 1)
+        self.slots[(self.cursor + ticks) % len(self.slots)].add(beat)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(next_tick - loop.time(), 0))
+            self.cursor = (self.cursor + 1) % len(self.slots)
+            slot, self.slots[self.cursor] = self.slots[self.cursor], set()
+            try:
+                self._expire(slot, loop.time())
+            except Exception as exc:
+                logger.exception(f"heartbeat tick failed: {exc}")
+
+    def _expire(self, slot: set[Heartbeat], now: float) -> None:
+        for beat in slot:
+            if not beat.active or beat.outbox.closed:
+                self.unregister(beat)
+                continue
+
+            idle = now - beat.last_seen
+            if idle >= self.timeout:
+                self.unregister(beat)
+                heartbeat_stats["reaped"] += 1
+                asyncio.create_task(beat.outbox.close(status.WS_1001_GOING_AWAY))
+            elif idle >= self.interval and not beat.pinged:
+                beat.pinged = True
+                beat.outbox.put(PING, "ping")
+                heartbeat_stats["pings"] += 1
+                self._schedule(beat, self.timeout - idle)
+            elif beat.pinged:
+                self._schedule(beat, self.timeout - idle)
+            else:
+                self._schedule(beat, self.interval - idle)
+
+
+heartbeat_wheel = HeartbeatWheel()
@@ -1,59 +1,67 @@
 import json
+from uuid import uuid4
 
 from fastapi import WebSocket
 
-from app.api.v1.schemas.user import UserModel
-from ..message import change_msg_status
-from app.api.v1.schemas.notification import NotificationModel
+from app.core.logger import logger
 from ..auth import verify_ws_token
+from ..presence import user_connected, user_disconnected
 from app.api.v1.schemas.websocket import WebsocketRecievedMessage, WebSocketResponse
 from .connections import main_connections
+from .outbox import Outbox
+from .frame import Frame
+from .receipts import queue_receipt
 
 
 class MainConnectionManager:
-    def __init__(self, websocket: WebSocket, user_id: int) -> None:
+    def __init__(self, websocket: WebSocket, user_id: int, device_id: str) -> None:
         self.websocket = websocket
         self.user_id = user_id
+        self.device_id = device_id
+        self.outbox = Outbox(websocket)
 
     @classmethod
     async def connect(cls, websocket: WebSocket) -> "MainConnectionManager":
         await websocket.accept()
         token = await websocket.receive_text()
         user_id = verify_ws_token(token)
-        con = cls(websocket, user_id)
-        main_connections[user_id] = con
+        con = cls(websocket, user_id, get_device_id(websocket))
+        replaced = main_connections.add(user_id, con.device_id, con)
+        if replaced:
+            await replaced.outbox.close()
+        else:
+            await user_connected(user_id)
         return con
 
     @staticmethod
-    def disconnect(user_id) -> None:
-        main_connections.pop(user_id, None)
+    async def disconnect(con: "MainConnectionManager") -> None:
+        con.outbox.stop()
+        # a device taken over by a reconnect hands its presence count to the new socket
+        registered = con in main_connections.get(con.user_id)
+        main_connections.remove(con.user_id, con.device_id, con)
+        if registered:
+            await user_disconnected(con.user_id)
 
-    async def send_msg(self, msg: WebSocketResponse) -> None:
-        await self.websocket.send_text(msg.model_dump_json())
+    def send_msg(self, msg: WebSocketResponse) -> None:
+        self.outbox.put(Frame.from_model(msg))
 
-    @staticmethod
-    async def handle_msg(data: str):
+    async def handle_msg(self, data: str):
         try:
             msg = WebsocketRecievedMessage(**(json.loads(data)))
-        except ValueError as e:
-            print(e.__traceback__)
+        except ValueError as exc:
+            logger.exception(f"invalid frame from user {self.user_id}: {exc}")
             return None
 
         if msg.event_type == "change_message_status":
-            messages = await change_msg_status(
-                msg.data.message_id_list, msg.data.status, msg.sender_user.id
-            )
-            msg_response = WebSocketResponse(
-                event_type=msg.event_type, data=messages, sender_user=msg.sender_user
+            await queue_receipt(
+                msg.room_id,
+                self.user_id,
+                msg.sender_user,
+                msg.data.message_id_list,
+                msg.data.status,
             )
-            for message in messages:
-                if message.sender_id in main_connections:
-                    await main_connections[message.sender_id].send_msg(msg_response)
-
-    async def send_notification(
-        self, notification: NotificationModel, sender_user: UserModel
-    ):
-        notification_data = WebSocketResponse(
-            event_type="notification", data=[notification], sender_user=sender_user
-        )
-        await self.send_msg(notification_data)
+
+
+def get_device_id(websocket: WebSocket) -> str:
+    # a reconnecting tab may send its previous id to take over its old slot
+    return websocket.query_params.get("device_id") or uuid4().hex
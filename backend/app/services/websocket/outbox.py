@@ -0,0 +1,155 @@
+import asyncio
+from collections import deque
+from typing import Iterable, Sequence
+
+from fastapi import WebSocket
+from starlette import status
+
+from app.core.logger import logger
+from app.core.settings import WEBSOCKET
+from .frame import Frame, negotiate_encoding
+
+overflow_policies = ("drop_oldest", "coalesce", "disconnect")
+
+outbox_stats = {
+    "enqueued": 0,
+    "sent": 0,
+    "dropped": 0,
+    "coalesced": 0,
+    "disconnected": 0,
+}
+
+
+class Outbox:
+    """
+    Bounded outbound queue of a single websocket drained by its own writer task, so
+    fan-out only enqueues and a slow client never stalls the others.
+
+    Frames are written as text (json) or binary (msgpack) depending on the encoding
+    negotiated with the ``encoding`` query parameter of the websocket url.
+
+    Frames put with a coalesce key replace a still queued frame with the same key
+    under the "coalesce" policy, keeping only the latest state.
+
+    A paused outbox queues without writing until resume(), which lets a replayed
+    backlog go out ahead of the live frames that arrived meanwhile.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        maxsize: int = WEBSOCKET["OUTBOX_SIZE"],
+        policy: str = WEBSOCKET["OVERFLOW_POLICY"],
+        paused: bool = False,
+    ) -> None:
+        if policy not in overflow_policies:
+            raise ValueError(f"overflow policy must be one of {overflow_policies}")
+        self.websocket = websocket
+        self.encoding = negotiate_encoding(websocket.query_params.get("encoding"))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.closed = False
+        self.paused = paused
+        # frames of messages up to this room sequence or among these were replayed
+        self.skip_through: int | None = None
+        self.skip_seqs: set[int] = set()
+        self._queue: deque[list] = deque()
+        self._keyed: dict[str, list] = {}
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._drain())
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, frame: Frame, key: str | None = None) -> bool:
+        if self.closed:
+            return False
+        if self._replayed(frame):
+            return True
+
+        if key is not None and self.policy == "coalesce" and key in self._keyed:
+            self._keyed[key][1] = frame
+            outbox_stats["coalesced"] += 1
+            return True
+
+        if len(self._queue) >= self.maxsize:
+            if self.policy == "disconnect":
+                outbox_stats["disconnected"] += 1
+                logger.info("disconnecting slow websocket consumer")
+                asyncio.create_task(self.close(status.WS_1013_TRY_AGAIN_LATER))
+                return False
+            self._forget(self._queue.popleft())
+            outbox_stats["dropped"] += 1
+
+        entry = [key, frame]
+        self._queue.append(entry)
+        if key is not None:
+            self._keyed[key] = entry
+        outbox_stats["enqueued"] += 1
+        self._wakeup.set()
+        return True
+
+    def resume(
+        self,
+        frames: Sequence[Frame] = (),
+        skip_through: int | None = None,
+        skip_seqs: Iterable[int] = (),
+    ) -> None:
+        self.skip_through = skip_through
+        self.skip_seqs = set(skip_seqs)
+        queued = []
+        for entry in self._queue:
+            if self._replayed(entry[1]):
+                self._forget(entry)
+            else:
+                queued.append(entry)
+        self._queue = deque([[None, frame] for frame in frames] + queued)
+        self.paused = False
+        self._wakeup.set()
+
+    def _replayed(self, frame: Frame) -> bool:
+        if frame.seq is None:
+            return False
+        if self.skip_through is not None and frame.seq <= self.skip_through:
+            return True
+        return frame.seq in self.skip_seqs
+
+    def stop(self) -> None:
+        self.closed = True
+        self._writer.cancel()
+        self._queue.clear()
+        self._keyed.clear()
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE) -> None:
+        if self.closed:
+            return
+        self.stop()
+        try:
+            await self.websocket.close(code=code)
+        except RuntimeError:
+            # websocket already closed by the client
+            pass
+
+    def _forget(self, entry: list) -> None:
+        key = entry[0]
+        if key is not None and self._keyed.get(key) is entry:
+            del self._keyed[key]
+
+    async def _drain(self) -> None:
+        while True:
+            while not self._queue or self.paused:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            entry = self._queue.popleft()
+            self._forget(entry)
+            frame: Frame = entry[1]
+            try:
+                if self.encoding == "msgpack":
+                    await self.websocket.send_bytes(frame.msgpack)
+                else:
+                    await self.websocket.send_text(frame.text)
+            except Exception as exc:
+                logger.info(f"websocket writer stopped: {exc}")
+                self.closed = True
+                return
+            outbox_stats["sent"] += 1
@@ -0,0 +1,111 @@
+import asyncio
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.api.v1.schemas.user import UserModel
+from app.api.v1.schemas.websocket import MessageReceipt, WebSocketResponse
+from app.core.logger import logger
+from app.core.settings import WEBSOCKET
+from app.db.mango.models.message import valid_message_status
+from ..message import apply_receipt
+from ..room_cache import room_cache
+from .dispatch import publish_to_room
+
+
+class ReceiptAggregator:
+    """
+    Collects change_message_status events of one room for a short window and applies
+    them as a single watermark per reader and status: marking message X implies every
+    earlier message of the room. Each window costs one bulk update and one compact
+    "message_receipt" event instead of a write and a frame per client event.
+    """
+
+    def __init__(self, room_id: str, delay: float = WEBSOCKET["RECEIPT_DEBOUNCE"]):
+        self.room_id = room_id
+        self.delay = delay
+        self.pending: dict[tuple[int, str], ObjectId] = {}
+        self.readers: dict[int, UserModel] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    def add(self, reader: UserModel, message_ids: list[str], msg_status: str) -> None:
+        up_to = None
+        for message_id in message_ids:
+            try:
+                object_id = ObjectId(message_id)
+            except (InvalidId, TypeError):
+                continue
+            if up_to is None or object_id > up_to:
+                up_to = object_id
+        if up_to is None:
+            return
+
+        key = (reader.id, msg_status)
+        if key not in self.pending or up_to > self.pending[key]:
+            self.pending[key] = up_to
+        self.readers[reader.id] = reader
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.delay)
+        # events arriving while this window is written start a fresh aggregator
+        if receipt_aggregators.get(self.room_id) is self:
+            del receipt_aggregators[self.room_id]
+        pending, readers = self.pending, self.readers
+
+        # apply delivered before seen so the last write always holds the highest status
+        for (reader_id, msg_status), up_to in sorted(
+            pending.items(), key=lambda item: valid_message_status.index(item[0][1])
+        ):
+            try:
+                await self.flush(readers[reader_id], msg_status, up_to)
+            except Exception as exc:
+                logger.exception(
+                    f"failed to apply receipts of room {self.room_id}: {exc}"
+                )
+
+    async def flush(self, reader: UserModel, msg_status: str, up_to: ObjectId) -> None:
+        senders = await apply_receipt(self.room_id, reader.id, up_to, msg_status)
+        if not senders:
+            return
+        receipt = MessageReceipt(
+            room_id=self.room_id,
+            reader_id=reader.id,
+            status=msg_status,
+            up_to=str(up_to),
+        )
+        response = WebSocketResponse(
+            event_type="message_receipt", data=[receipt], sender_user=reader
+        )
+        await publish_to_room(
+            self.room_id,
+            [*senders, reader.id],
+            response,
+            key=f"receipt:{self.room_id}:{reader.id}:{msg_status}",
+        )
+
+
+receipt_aggregators: dict[str, ReceiptAggregator] = {}
+
+
+async def queue_receipt(
+    room_id: str,
+    user_id: int,
+    reader: UserModel,
+    message_ids: list[str],
+    msg_status: str,
+) -> None:
+    # "sent" is the initial status, there is nothing to upgrade to
+    if msg_status not in valid_message_status[1:]:
+        return
+    # the reader comes from the frame, it only counts for the socket's own user and
+    # only in rooms that user belongs to
+    if reader.id != user_id or not await room_cache.is_member(room_id, user_id):
+        logger.warning(f"rejected receipt of user {user_id} for room {room_id}")
+        return
+    aggregator = receipt_aggregators.get(room_id)
+    if aggregator is None:
+        aggregator = receipt_aggregators[room_id] = ReceiptAggregator(room_id)
+    aggregator.add(reader, message_ids, msg_status)
@@ -1,124 +1,196 @@
+import asyncio
 import json
 
 from fastapi import WebSocketException, WebSocket
 from starlette import status
 
 from app.api.v1.schemas.user import UserModel
-from ..message import save_new_message, change_msg_status
+from ..message import save_new_message, get_messages_after, get_committed_seq
 from ..auth import verify_ws_token
-from app.db.mango.session import mango_sessionmanager
-from app.db.mango.models.room import Room
+from ..room_cache import room_cache, RoomEntry
 from app.db.mango.models.message import Message
+from app.core.settings import WEBSOCKET
 
-from bson import ObjectId
-from bson.errors import InvalidId
 from app.api.v1.schemas.websocket import (
     WebsocketRecievedMessage,
     WebSocketResponse,
     EventType,
 )
-from .connections import room_connections, main_connections
+from .connections import room_connections, ConnectionRegistry
+from .dispatch import publish_to_room
+from .outbox import Outbox
+from .frame import Frame
+from .receipts import queue_receipt
+from .main_manager import get_device_id
 from app.core.logger import logger
 
 
 class RoomManager:
-    def __init__(self, room_name: str):
+    def __init__(self, room_name: str, entry: RoomEntry):
         self.room = room_name
-        self.connected_users: dict[int, WebSocket] = {}
-        self.room_users: list[int] = []
+        self.entry = entry
+        self.connected_users: ConnectionRegistry[int, Outbox] = ConnectionRegistry()
+        # saved messages reach it in commit order, it keeps that order when publishing
+        self.publish_lock = asyncio.Lock()
+
+    @property
+    def room_users(self) -> set[int]:
+        return self.entry.members
 
     @classmethod
     async def connect(
         cls, websocket: WebSocket, room_id: str
-    ) -> tuple["RoomManager", int]:
+    ) -> tuple["RoomManager", int, str, Outbox]:
         await websocket.accept()
-        room = await cls.check_room(room_id)
-        if not room:
+        entry = await cls.check_room(room_id)
+        if not entry:
             raise WebSocketException(
                 code=status.WS_1003_UNSUPPORTED_DATA, reason="Invalid room id"
             )
 
-        token = await websocket.receive_text()
+        token, resume_from = parse_handshake(await websocket.receive_text())
 
         user_id = verify_ws_token(token)
-        if room_id in room_connections:
-            room_connections[room_id].connected_users[user_id] = websocket
+        if user_id not in entry.members:
+            raise WebSocketException(
+                code=status.WS_1008_POLICY_VIOLATION, reason="user not in room"
+            )
+        if room_id not in room_connections:
+            room_connections[room_id] = cls(room_id, entry)
+        room = room_connections[room_id]
+
+        device_id = get_device_id(websocket)
+        outbox = Outbox(websocket, paused=resume_from is not None)
+        replaced = room.connected_users.add(user_id, device_id, outbox)
+        if replaced:
+            await replaced.close()
+        if resume_from is not None:
+            await room.replay(outbox, resume_from)
+
+        return room, user_id, device_id, outbox
+
+    async def replay(self, outbox: Outbox, resume_from: int):
+        """
+        Send the messages after ``resume_from`` as one "message_backlog" event ahead of
+        the live events queued meanwhile, dropping the live ones already replayed.
+        ``resume_from`` is the committed watermark the client last saw. Messages above
+        it that the client already received can come again, the client drops them.
+        """
+        limit = WEBSOCKET["RESUME_LIMIT"]
+        try:
+            # read before the messages: everything up to it is in the result
+            committed = await get_committed_seq(self.room)
+            messages = await get_messages_after(self.room, resume_from, limit + 1)
+        except Exception as exc:
+            logger.exception(f"failed to replay room {self.room}: {exc}")
+            outbox.resume([self.resync_frame()])
+            return
+        if len(messages) > limit:
+            # too far behind, the client reloads the room over http instead
+            outbox.resume([self.resync_frame()])
+        elif messages:
+            backlog = WebSocketResponse(
+                event_type="message_backlog", data=messages, committed=committed
+            )
+            outbox.resume(
+                [Frame.from_model(backlog)],
+                skip_through=resume_from,
+                skip_seqs={message.seq for message in messages},
+            )
         else:
-            new_room = cls(room_id)
-            new_room.room_users = [usr.user_id for usr in room.users]
-            new_room.connected_users[user_id] = websocket
-            room_connections[room_id] = new_room
+            outbox.resume(skip_through=resume_from)
 
-        return room_connections[room_id], user_id
+    def resync_frame(self) -> Frame:
+        return Frame(
+            json.dumps({"event_type": "resync", "room_id": self.room}).encode()
+        )
 
     @staticmethod
-    def disconnect(room_id: str, user_id: int):
+    def disconnect(room_id: str, user_id: int, device_id: str, outbox: Outbox):
+        outbox.stop()
         room = room_connections.get(room_id)
         if room:
-            room.connected_users.pop(user_id, None)
+            room.connected_users.remove(user_id, device_id, outbox)
             if not room.connected_users:
                 room.delete_room()
 
     async def close_room(self):
-        for key in self.connected_users.copy().keys():
-            await self.connected_users[key].close()
+        for outbox in list(self.connected_users.values()):
+            await outbox.close()
         self.delete_room()
 
     def delete_room(self):
         if self.room in room_connections:
             del room_connections[self.room]
 
-    async def handle_msg(self, data: str):
+    async def handle_msg(self, data: str, user_id: int):
         try:
             msg = WebsocketRecievedMessage(**(json.loads(data)))
-        except ValueError as e:
-            print(e.__traceback__)
+        except ValueError as exc:
+            logger.exception(f"invalid frame from user {user_id}: {exc}")
+            return None
+        # the socket is bound to one room and one user, a frame naming others would
+        # take seqs of another room's counter
+        if msg.room_id != self.room or msg.sender_user.id != user_id:
+            logger.warning(f"rejected frame of user {user_id} for room {msg.room_id}")
             return None
 
         if msg.event_type == "new_message":
-            message = await save_new_message(
+            message, committed = await save_new_message(
                 {
-                    "room_id": msg.room_id,
+                    "room_id": self.room,
                     "message_text": msg.data.message_text,
-                    "sender_id": msg.sender_user.id,
+                    "sender_id": user_id,
                 }
             )
-            await self.broadcast([message], msg.event_type, msg.sender_user)
+            await self.broadcast([message], msg.event_type, msg.sender_user, committed)
 
         elif msg.event_type == "change_message_status":
-            print("change_message_status", msg)
-
-            message = await change_msg_status(
-                msg.data.message_id_list, msg.data.status, msg.sender_user.id
+            await queue_receipt(
+                self.room,
+                user_id,
+                msg.sender_user,
+                msg.data.message_id_list,
+                msg.data.status,
             )
-            await self.broadcast(message, msg.event_type, msg.sender_user)
 
     async def broadcast(
-        self, msg: list[Message], event_type: EventType, sender_user: UserModel
+        self,
+        msg: list[Message],
+        event_type: EventType,
+        sender_user: UserModel,
+        committed: int | None = None,
     ):
         msg_response = WebSocketResponse(
-            event_type=event_type, data=msg, sender_user=sender_user
+            event_type=event_type,
+            data=msg,
+            sender_user=sender_user,
+            committed=committed,
         )
-
-        # send a msg to online user who not connected in room.
-        for user in [
-            usr for usr in self.room_users if usr not in self.connected_users.keys()
-        ]:
-            if user in main_connections.keys():
-                await main_connections[user].send_msg(msg_response)
-
-        for websocket in self.connected_users.values():
-            await websocket.send_text(msg_response.model_dump_json())
+        async with self.publish_lock:
+            # reloads the shared entry in place if it was invalidated meanwhile
+            await room_cache.get(self.room)
+            await publish_to_room(
+                self.room, self.room_users, msg_response, seq=msg[-1].seq
+            )
 
     @staticmethod
-    async def check_room(room_id: str):
-        try:
-            room_object_id = ObjectId(room_id)
-        except InvalidId:
-            return None
-        async with mango_sessionmanager.engine.session() as mangodb:
-            room = await mangodb.find_one(Room, Room.id == room_object_id)
-            if room:
-                return room if room.is_active else None
-            else:
-                return None
+    async def check_room(room_id: str) -> RoomEntry | None:
+        entry = await room_cache.get(room_id)
+        return entry if entry and entry.is_active else None
+
+
+def parse_handshake(data: str) -> tuple[str, int | None]:
+    # the first frame is the token, or {"token": ..., "resume_from": seq} to replay
+    # the messages missed since seq
+    if not data.startswith("{"):
+        return data, None
+    try:
+        handshake = json.loads(data)
+        token = handshake["token"]
+    except (ValueError, KeyError, TypeError):
+        return data, None
+    resume_from = handshake.get("resume_from")
+    if not isinstance(resume_from, int) or isinstance(resume_from, bool):
+        resume_from = None
+    return str(token), resume_from
@@ -0,0 +1,40 @@
+import json
+
+from ..ratelimit import (
+    take,
+    ws_connection_limiter,
+    ws_room_limiter,
+    ws_user_limiter,
+)
+from .frame import Frame
+from .outbox import Outbox
+
+
+class FrameThrottle:
+    """
+    Rate limits the inbound frames of one websocket against its own bucket, the
+    user's bucket shared by all of its sockets and, for room sockets, the room's
+    bucket. A throttled frame is dropped and answered with a "slow_down" event
+    telling the client how long to back off; the socket stays open.
+    """
+
+    def __init__(self, outbox: Outbox, user_id: int, room_id: str | None = None):
+        self.outbox = outbox
+        self.user_id = user_id
+        self.room_id = room_id
+        self.bucket = ws_connection_limiter.new_bucket()
+
+    def allow(self) -> bool:
+        limits = [
+            (ws_connection_limiter, self.bucket),
+            (ws_user_limiter, ws_user_limiter.bucket(self.user_id)),
+        ]
+        if self.room_id is not None:
+            limits.append((ws_room_limiter, ws_room_limiter.bucket(self.room_id)))
+
+        retry_after = take(limits)
+        if not retry_after:
+            return True
+        event = {"event_type": "slow_down", "retry_after": round(retry_after, 3)}
+        self.outbox.put(Frame(json.dumps(event).encode()), "slow_down")
+        return False
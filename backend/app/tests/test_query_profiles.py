@@ -0,0 +1,163 @@
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+
+from app.db.postgres.base import Base
+from app.db.postgres.models.user import BlockedUser, Friend, RequestedUser, User
+from app.extra.query import UserQuery
+
+COLLECTIONS = (
+    "friend",
+    "friend_by",
+    "requested_user",
+    "requested_by",
+    "blocked_user",
+    "blocked_by",
+)
+
+# statements a profile runs: the user row, then one SELECT ... IN per collection
+EXPECTED = {
+    "identity": (1, ()),
+    "friends": (3, ("friend", "friend_by")),
+    "relations": (
+        6,
+        ("friend", "friend_by", "requested_user", "requested_by", "blocked_user"),
+    ),
+    "full": (7, COLLECTIONS),
+}
+
+
+class AsyncAdapter:
+    # the awaitable surface of AsyncSession that Query uses, over a sync session
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def scalars(self, statement):
+        return self.session.scalars(statement)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    tables = [
+        Base.metadata.tables[name]
+        for name in ("users", "Friend", "RequestedUser", "BlockedUser")
+    ]
+    Base.metadata.create_all(engine, tables=tables)
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {
+                    "id": i,
+                    "uid": f"uid{i}",
+                    "first_name": "user",
+                    "last_name": str(i),
+                    "email": f"user{i}@example.com",
+                    "contact_number": i,
+                    "username": f"user{i}",
+                    "hashed_password": "",
+                }
+                for i in range(1, 6)
+            ],
+        )
+        # user 1 has two of every relation, so a cartesian join would repeat rows
+        conn.execute(
+            insert(Friend),
+            [{"user_id": 1, "friend_user_id": 2}, {"user_id": 1, "friend_user_id": 3}],
+        )
+        conn.execute(
+            insert(Friend),
+            [{"user_id": 4, "friend_user_id": 1}, {"user_id": 5, "friend_user_id": 1}],
+        )
+        conn.execute(
+            insert(RequestedUser),
+            [
+                {"user_id": 1, "requested_user_id": 4},
+                {"user_id": 1, "requested_user_id": 5},
+                {"user_id": 2, "requested_user_id": 1},
+                {"user_id": 3, "requested_user_id": 1},
+            ],
+        )
+        # a BIGINT key is no rowid alias in sqlite, so no autoincrement
+        conn.execute(
+            insert(BlockedUser),
+            [
+                {"id": 1, "user_id": 1, "blocked_user_id": 2},
+                {"id": 2, "user_id": 1, "blocked_user_id": 4},
+                {"id": 3, "user_id": 3, "blocked_user_id": 1},
+                {"id": 4, "user_id": 5, "blocked_user_id": 1},
+            ],
+        )
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def statements(engine):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("profile", EXPECTED)
+async def test_profile_statements_and_rows(engine, statements, profile):
+    expected_statements, loaded = EXPECTED[profile]
+    with Session(engine) as session:
+        query = UserQuery(AsyncAdapter(session), profile=profile)
+        users = await query.get_all_filter()
+        assert len(statements) == expected_statements
+        # one row per user whatever the profile loads
+        assert sorted(user.id for user in users) == [1, 2, 3, 4, 5]
+
+        user = next(user for user in users if user.id == 1)
+        for name in loaded:
+            assert len(getattr(user, name)) == 2
+        # touching what was loaded runs nothing more
+        assert len(statements) == expected_statements
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("profile", EXPECTED)
+async def test_profile_raises_on_left_out_relationship(engine, profile):
+    _, loaded = EXPECTED[profile]
+    with Session(engine) as session:
+        user = await UserQuery.one(AsyncAdapter(session), 1, profile)
+        for name in COLLECTIONS:
+            if name in loaded:
+                # the related users come without their own relationships
+                with pytest.raises(InvalidRequestError):
+                    getattr(getattr(user, name)[0], "friend")
+            else:
+                with pytest.raises(InvalidRequestError):
+                    getattr(user, name)
+
+
+def test_unknown_profile(engine):
+    with Session(engine) as session:
+        with pytest.raises(ValueError):
+            UserQuery(AsyncAdapter(session), profile="everything")
+
+
+@pytest.mark.anyio
+async def test_many_loads_only_the_given_ids(engine, statements):
+    with Session(engine) as session:
+        users = await UserQuery.many(AsyncAdapter(session), [2, 4], "identity")
+        assert len(statements) == 1
+        assert sorted(user.id for user in users) == [2, 4]
+        with pytest.raises(InvalidRequestError):
+            users[0].friend
@@ -0,0 +1,117 @@
+import json
+import sys
+
+import pytest
+
+if sys.version_info < (3, 12):
+    pytest.skip("the websocket schemas need python 3.12", allow_module_level=True)
+
+from app.db.mango.models.message import Message
+from app.db.mango.models.room import Room
+from app.services import inbox
+from app.services.room_cache import RoomEntry
+from app.services.websocket import room_manager
+from app.services.websocket.room_manager import RoomManager
+
+ROOM_A = "a" * 24
+ROOM_B = "b" * 24
+
+
+def make_entry(*members: int) -> RoomEntry:
+    room = Room(
+        users=[{"user_id": member, "isAdmin": False} for member in members],
+        type="group",
+        is_active=True,
+    )
+    return RoomEntry(room, ttl=60)
+
+
+def new_message_frame(room_id: str, sender_id: int) -> str:
+    return json.dumps(
+        {
+            "event_type": "new_message",
+            "room_id": room_id,
+            "data": {"message_text": "hello"},
+            "sender_user": {
+                "id": sender_id,
+                "uid": "uid",
+                "username": "username",
+                "profile": "",
+                "email": "user@example.com",
+                "first_name": "first",
+                "last_name": "last",
+                "contact_number_country_code": 977,
+                "contact_number": 9800000000,
+                "address": "address",
+            },
+        }
+    )
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    saved = []
+
+    async def save_new_message(msg):
+        saved.append(msg)
+        return Message(**msg, seq=len(saved)), len(saved)
+
+    async def broadcast(self, *args):
+        pass
+
+    monkeypatch.setattr(room_manager, "save_new_message", save_new_message)
+    monkeypatch.setattr(RoomManager, "broadcast", broadcast)
+    return saved
+
+
+@pytest.mark.anyio
+async def test_frame_naming_another_room_is_rejected(saved):
+    room = RoomManager(ROOM_A, make_entry(1, 2))
+    await room.handle_msg(new_message_frame(ROOM_B, 1), user_id=1)
+    assert saved == []
+
+
+@pytest.mark.anyio
+async def test_frame_naming_another_sender_is_rejected(saved):
+    room = RoomManager(ROOM_A, make_entry(1, 2))
+    await room.handle_msg(new_message_frame(ROOM_A, 2), user_id=1)
+    assert saved == []
+
+
+@pytest.mark.anyio
+async def test_message_is_saved_to_the_socket_room(saved):
+    room = RoomManager(ROOM_A, make_entry(1, 2))
+    await room.handle_msg(new_message_frame(ROOM_A, 1), user_id=1)
+    assert saved == [{"room_id": ROOM_A, "message_text": "hello", "sender_id": 1}]
+
+
+@pytest.mark.anyio
+async def test_inbox_ignores_messages_of_non_members(monkeypatch):
+    entries = {ROOM_A: make_entry(1, 2), ROOM_B: make_entry(3, 4)}
+    writes = []
+
+    class Collection:
+        async def bulk_write(self, updates, ordered):
+            writes.extend(update._filter for update in updates)
+
+    class Cache:
+        async def get(self, room_id):
+            return entries.get(room_id)
+
+    monkeypatch.setattr(inbox, "room_cache", Cache())
+    monkeypatch.setattr(inbox, "inbox_collection", Collection)
+
+    await inbox.record_messages(
+        [
+            Message(room_id=ROOM_A, sender_id=1, message_text="hello"),
+            # sent by a member of room A naming room B
+            Message(room_id=ROOM_B, sender_id=1, message_text="spoofed"),
+        ]
+    )
+    assert sorted(write["user_id"] for write in writes) == [1, 2]
+    assert {write["room_id"] for write in writes} == {ROOM_A}
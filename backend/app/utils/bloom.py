@@ -0,0 +1,32 @@
+class BloomFilter:
+    """
+    Bloom filter of sha256 digests. The digest is already uniformly distributed, so the
+    bit positions are consecutive 4 byte slices of it instead of extra hash functions.
+    """
+
+    def __init__(self, bits: int, hashes: int) -> None:
+        if not 0 < hashes <= 8:
+            raise ValueError("a sha256 digest provides at most 8 positions")
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray((bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes):
+        for i in range(0, self.hashes * 4, 4):
+            yield int.from_bytes(digest[i : i + 4], "little") % self.bits
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self.array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(
+            self.array[position >> 3] & (1 << (position & 7))
+            for position in self._positions(digest)
+        )
+
+    def clear(self) -> None:
+        self.array = bytearray(len(self.array))
+        self.count = 0
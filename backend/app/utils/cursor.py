@@ -0,0 +1,30 @@
+import base64
+import binascii
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def encode_cursor(object_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(object_id.binary).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> ObjectId | None:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, InvalidId, ValueError, TypeError):
+        return None
+
+
+def encode_keyset(values: list) -> str:
+    data = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_keyset(cursor: str) -> list | None:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
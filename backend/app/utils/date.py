@@ -1,10 +1,32 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Annotated
 
 import pytz
+from pydantic import PlainSerializer
 
+# timestamps are stored as utc datetimes and only formatted at the api edge, in the
+# format and timezone the clients parse
 datetime_format = "%b %d %Y %I:%M:%S %p"
+display_timezone = pytz.timezone("Asia/Kathmandu")
 
 
-def formated_date():
-    kathmandu_tz = pytz.timezone("Asia/Kathmandu")
-    return datetime.now(kathmandu_tz).strftime(datetime_format)
\ No newline at end of file
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def format_datetime(value: datetime) -> str:
+    # mongo hands back naive datetimes that are already utc
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(display_timezone).strftime(datetime_format)
+
+
+def parse_formated_date(value: str) -> datetime:
+    """Inverse of the old stored string format, used by the migrations"""
+    local = display_timezone.localize(datetime.strptime(value, datetime_format))
+    return local.astimezone(timezone.utc)
+
+
+ApiDateTime = Annotated[
+    datetime, PlainSerializer(format_datetime, return_type=str, when_used="json")
+]
@@ -0,0 +1,399 @@
+"""
+Websocket load and fan-out benchmark.
+
+Serves the app with uvicorn from this script, seeds group rooms in Mongo, connects
+one room socket (and optionally one main socket) per simulated user and drives a
+mix of new_message and change_message_status traffic. End-to-end latency is taken
+from the send timestamp carried in every message text.
+
+The server runs in a child process so client load and memory stay out of its
+numbers. Rooms and messages go to a dedicated Mongo database (--db, whose name must
+contain "bench") on the server configured in .env, and are removed at the end
+unless --keep is given. Postgres is only read.
+
+    cd backend
+    python -m benchmarks.ws_bench --rooms 500 --users-per-room 4 --duration 30 \
+        --out bench-results.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import time
+from types import SimpleNamespace
+
+import websockets
+
+WS_PATH = "/api/v1/ws"
+BASE_USER_ID = 1_000_000_000
+BENCH_DB = "hellochat_bench"
+
+
+def serve(host: str, port: int, no_ratelimit: bool) -> None:
+    import uvicorn
+
+    from app.services import ratelimit
+    from main import app
+
+    if no_ratelimit:
+        for limiter in (
+            ratelimit.ws_connection_limiter,
+            ratelimit.ws_user_limiter,
+            ratelimit.ws_room_limiter,
+        ):
+            limiter.rate = limiter.burst = float("inf")
+
+    uvicorn.run(app, host=host, port=port, log_level="warning")
+
+
+def rss_kb(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_user(user_id: int) -> dict:
+    return {
+        "id": user_id,
+        "uid": f"bench{user_id}",
+        "username": f"bench{user_id}",
+        "profile": "",
+        "email": f"bench{user_id}@example.com",
+        "first_name": "Bench",
+        "last_name": "User",
+        "contact_number_country_code": 977,
+        "contact_number": 9800000000,
+        "address": "benchmark",
+    }
+
+
+def access_token(user_id: int) -> str:
+    from app.services.auth import Token
+
+    user = SimpleNamespace(
+        id=user_id, username=f"bench{user_id}", is_superuser=False, is_active=True
+    )
+    return Token(user).get_token()["access_token"]
+
+
+async def seed_rooms(rooms: int, users_per_room: int) -> list[tuple[str, list[int]]]:
+    from app.db.mango.models.room import Room, RoomUser
+    from app.db.mango.session import mango_sessionmanager
+
+    seeded = []
+    documents = []
+    for index in range(rooms):
+        first = BASE_USER_ID + index * users_per_room
+        user_ids = list(range(first, first + users_per_room))
+        room = Room(
+            users=[RoomUser(user_id=user_id, isAdmin=True) for user_id in user_ids],
+            type="group",
+            created_by=user_ids[0],
+            is_active=True,
+        )
+        documents.append(room)
+        seeded.append((str(room.id), user_ids))
+    await mango_sessionmanager.engine.save_all(documents)
+    return seeded
+
+
+async def cleanup(room_ids: list[str]) -> None:
+    from bson import ObjectId
+
+    from app.db.mango.models.message import Message
+    from app.db.mango.models.room import Room
+    from app.db.mango.session import mango_sessionmanager
+
+    engine = mango_sessionmanager.engine
+    await engine.get_collection(Message).delete_many({"room_id": {"$in": room_ids}})
+    await engine.get_collection(Room).delete_many(
+        {"_id": {"$in": [ObjectId(room_id) for room_id in room_ids]}}
+    )
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.measuring = False
+        self.latencies: list[float] = []
+        self.sent = {"new_message": 0, "change_message_status": 0}
+        self.received = {"new_message": 0, "message_receipt": 0, "slow_down": 0}
+        self.connected = 0
+        self.failed = 0
+
+
+class Client:
+    def __init__(
+        self, url: str, token: str, user_id: int, room_id: str | None, stats: Stats
+    ) -> None:
+        self.url = url
+        self.token = token
+        self.user = bench_user(user_id)
+        self.room_id = room_id
+        self.stats = stats
+        self.ws = None
+        self.last_received: str | None = None
+        self._reader: asyncio.Task | None = None
+
+    async def connect(self, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            try:
+                self.ws = await websockets.connect(
+                    self.url, max_queue=None, open_timeout=30, ping_interval=None
+                )
+                await self.ws.send(self.token)
+            except Exception:
+                self.stats.failed += 1
+                self.ws = None
+                return
+        self.stats.connected += 1
+        self._reader = asyncio.create_task(self.read())
+
+    async def read(self) -> None:
+        try:
+            async for data in self.ws:
+                event = json.loads(data)
+                event_type = event["event_type"]
+                if event_type == "ping":
+                    await self.ws.send("pong")
+                    continue
+                if event_type in self.stats.received:
+                    self.stats.received[event_type] += 1
+                if event_type != "new_message":
+                    continue
+                message = event["data"][0]
+                if message["sender_id"] != self.user["id"]:
+                    self.last_received = message["id"]
+                _, _, sent_ns = (message["message_text"] or "").partition(" ")
+                if self.stats.measuring and sent_ns.isdigit():
+                    self.stats.latencies.append((time.time_ns() - int(sent_ns)) / 1e6)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def drive(self, until: float, rate: float, status_ratio: float) -> None:
+        rng = random.Random(self.user["id"])
+        while self.ws is not None:
+            await asyncio.sleep(rng.expovariate(rate))
+            if time.monotonic() >= until:
+                return
+            if self.last_received and rng.random() < status_ratio:
+                event_type = "change_message_status"
+                data = {"message_id_list": [self.last_received], "status": "seen"}
+            else:
+                event_type = "new_message"
+                data = {"message_text": f"bench {time.time_ns()}"}
+            frame = {
+                "event_type": event_type,
+                "room_id": self.room_id,
+                "data": data,
+                "sender_user": self.user,
+            }
+            try:
+                await self.ws.send(json.dumps(frame))
+            except websockets.ConnectionClosed:
+                return
+            if self.stats.measuring:
+                self.stats.sent[event_type] += 1
+
+    async def close(self) -> None:
+        if self.ws is not None:
+            await self.ws.close()
+        if self._reader is not None:
+            await self._reader
+
+
+async def wait_for_server(host: str, port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run(args: argparse.Namespace, server_pid: int) -> dict:
+    base_url = f"ws://{args.host}:{args.port}{WS_PATH}"
+    stats = Stats()
+    rooms = await seed_rooms(args.rooms, args.users_per_room)
+
+    clients = []
+    for room_id, user_ids in rooms:
+        for user_id in user_ids:
+            token = access_token(user_id)
+            clients.append(
+                Client(f"{base_url}/{room_id}", token, user_id, room_id, stats)
+            )
+            if args.main_sockets:
+                clients.append(Client(f"{base_url}/", token, user_id, None, stats))
+
+    try:
+        rss_idle = rss_kb(server_pid)
+        semaphore = asyncio.Semaphore(args.connect_concurrency)
+        connect_started = time.monotonic()
+        await asyncio.gather(*(client.connect(semaphore) for client in clients))
+        connect_seconds = time.monotonic() - connect_started
+        # let the server finish registering the sockets before sampling memory
+        await asyncio.sleep(1)
+        rss_connected = rss_kb(server_pid)
+
+        room_clients = [client for client in clients if client.room_id]
+        until = time.monotonic() + args.warmup + args.duration
+        drivers = asyncio.gather(
+            *(
+                client.drive(until, args.rate, args.status_ratio)
+                for client in room_clients
+            )
+        )
+        await asyncio.sleep(args.warmup)
+        stats.measuring = True
+        measure_started = time.monotonic()
+        await drivers
+        await asyncio.sleep(args.drain)
+        stats.measuring = False
+        measured = time.monotonic() - measure_started
+        rss_loaded = rss_kb(server_pid)
+
+        await asyncio.gather(*(client.close() for client in clients))
+    finally:
+        if not args.keep:
+            await cleanup([room_id for room_id, _ in rooms])
+
+    latencies = sorted(stats.latencies)
+    per_connection = None
+    if rss_idle is not None and rss_connected is not None and stats.connected:
+        per_connection = round((rss_connected - rss_idle) / stats.connected, 2)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "config": vars(args),
+        "connections": {
+            "requested": len(clients),
+            "established": stats.connected,
+            "failed": stats.failed,
+            "connect_seconds": round(connect_seconds, 3),
+        },
+        "sent": stats.sent,
+        "received": stats.received,
+        "latency_ms": {
+            "samples": len(latencies),
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "throughput_per_second": {
+            "sent": round(sum(stats.sent.values()) / args.duration, 2),
+            "delivered": round(stats.received["new_message"] / measured, 2),
+        },
+        "server_memory_kb": {
+            "idle": rss_idle,
+            "connected": rss_connected,
+            "loaded": rss_loaded,
+            "per_connection": per_connection,
+        },
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rooms", type=int, default=250)
+    parser.add_argument("--users-per-room", type=int, default=4)
+    parser.add_argument(
+        "--main-sockets",
+        action="store_true",
+        help="also open the main /ws/ socket of every user",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0.5, help="frames per second per room socket"
+    )
+    parser.add_argument(
+        "--status-ratio",
+        type=float,
+        default=0.3,
+        help="share of frames that are change_message_status",
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument(
+        "--drain", type=float, default=2, help="seconds to wait for in-flight events"
+    )
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument(
+        "--no-ratelimit", action="store_true", help="disable websocket rate limits"
+    )
+    parser.add_argument(
+        "--db", default=BENCH_DB, help="mongo database the rooms are seeded in"
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rooms")
+    parser.add_argument("--out", help="write the json results to this file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    # the benchmark inserts and bulk deletes, never let it near a live database
+    if "bench" not in args.db:
+        raise SystemExit(
+            f"refusing to use mongo database {args.db!r}, its name must contain bench"
+        )
+    # read by app.core.settings, in this process and in the spawned server
+    os.environ["MANGODB_NAME"] = args.db
+
+    # every simulated socket needs a file descriptor on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = 1 << 16 if hard == resource.RLIM_INFINITY else hard
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+    server = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(args.host, args.port, args.no_ratelimit), daemon=True
+    )
+    server.start()
+    try:
+        asyncio.run(wait_for_server(args.host, args.port))
+        results = asyncio.run(run(args, server.pid))
+    finally:
+        server.terminate()
+        server.join()
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as out_file:
+            out_file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    # the app resolves .env and the static files directory from the backend root
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    main()
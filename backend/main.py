@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -9,17 +10,42 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.middlewares.auth import BearerTokenAuthBackend, AuthenticationMiddleware
 from app.db.postgres.session import sessionmanager
 from app.db.mango.session import mango_sessionmanager
+from app.db.indexes import apply_indexes
+from app.services.websocket.broker import broker
+from app.services.websocket.dispatch import deliver
+from app.services.websocket.connections import main_connections
+from app.services.websocket.heartbeat import heartbeat_wheel
+from app.services.presence import presence_table, refresh_presence
+from app.services.message import message_pipeline
+from app.services.refresh_token import load_revoked_filter, sweep_refresh_tokens
+from app.services.password import password_hasher
 from app.api.v1.router import v1_router
+from app.api.permission import public
 import json
 
 
 @asynccontextmanager
 async def lifespan(application: FastAPI):
     # on startup code
+    await apply_indexes()
+    await load_revoked_filter()
+    await broker.start(deliver)
+    presence_task = asyncio.create_task(refresh_presence(main_connections.keys))
+    token_sweep_task = asyncio.create_task(sweep_refresh_tokens())
+    heartbeat_wheel.start()
+    message_pipeline.start()
 
     yield
 
     # on shutdown code
+    await message_pipeline.stop()
+    password_hasher.shutdown()
+    heartbeat_wheel.stop()
+    presence_task.cancel()
+    token_sweep_task.cancel()
+    presence_table.close()
+    await broker.close()
+
     if sessionmanager.get_engine() is not None:
         # Close the DB connection
         await sessionmanager.close()
@@ -48,6 +74,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 # noinspection PyTypeChecker
 app.add_middleware(
@@ -57,6 +84,7 @@ app.add_middleware(
 
 
 @app.get("/", response_class=HTMLResponse)
+@public
 async def root():
     return """
     <html>
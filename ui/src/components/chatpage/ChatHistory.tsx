@@ -14,6 +14,7 @@ import useChatHistoryQuery from "../../queryHooks/useChatHistoryQuery";
 import { useContext, useEffect, useRef, useState } from "react";
 import AuthContext from "../../context/Auth";
 import { useDebouncedCallback } from "use-debounce";
+import { useInView } from "react-intersection-observer";
 
 type Props = {};
 
@@ -22,6 +23,7 @@ export default function ChatHistory({}: Props) {
   const { roomId } = useParams();
   const onlineUserQuery = useOnlineUserQuery();
   const historyQuery = useChatHistoryQuery();
+  const { inView, ref } = useInView();
 
   const context = useContext(AuthContext);
 
@@ -46,6 +48,12 @@ export default function ChatHistory({}: Props) {
       setHistoryUser(searchFilter());
     }
   }, [historyQuery.data]);
+
+  useEffect(() => {
+    if (inView && historyQuery.hasNextPage && !historyQuery.isFetchingNextPage) {
+      historyQuery.fetchNextPage();
+    }
+  }, [inView, historyQuery.hasNextPage, historyQuery.isFetchingNextPage]);
   return (
     <div className="flex flex-col h-full">
       <div className="flex gap-2 items-center min-h-[92px] px-[10%]">
@@ -154,6 +162,7 @@ export default function ChatHistory({}: Props) {
                 />
               </div>
             ))}
+            {historyQuery.hasNextPage && <div ref={ref} className="min-h-[1px]" />}
             {historyUser.length === 0 && (
               <div className="text-secondary-text font-semibold text-center text-[18px] px-5">
                 <p className="mt-10">No chat found</p>
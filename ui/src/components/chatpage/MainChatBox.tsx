@@ -48,6 +48,7 @@ export default function MainChatBox({}: Props) {
   const { sendJsonMessage, isConnected, readyState } = useNewWebsocket({
     url: `/${roomId}`,
     onMessage: handleRoomMessage.onMessage,
+    resumable: true,
   });
 
   useMsgSeenEffect(
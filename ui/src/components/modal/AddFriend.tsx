@@ -37,6 +37,7 @@ const AddFriendModal = () => {
   const { inView, ref } = useInView();
 
   const userQuery = useAddFriendQuery(searchT, search);
+  const users = userQuery.data?.pages.flatMap((page) => page.users) ?? [];
 
   const context = useContext(AuthContext);
 
@@ -111,20 +112,18 @@ const AddFriendModal = () => {
           <p className="text-red-color text-center">
             Error: {userQuery.error.message}
           </p>
-        ) : userQuery.data?.pages.flat().length === 0 ? (
+        ) : users.length === 0 ? (
           <p className="text-center text-xl font-medium text-secondary-text">
             No users found
           </p>
         ) : (
-          userQuery.data?.pages.flat().map((user, index) => {
+          users.map((user, index) => {
             const buttonStyle = extractButtonStyle(user);
             return (
               <div
                 key={user.id}
                 className="flex justify-between items-center w-full"
-                ref={
-                  index === userQuery.data?.pages.flat().length - 1 ? ref : null
-                }
+                ref={index === users.length - 1 ? ref : null}
               >
                 <div className="flex gap-5 justify-between items-center">
                   <ProfilePic size={50} image={user.profile} />
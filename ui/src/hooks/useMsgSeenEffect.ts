@@ -1,6 +1,6 @@
 import { InfiniteData } from "@tanstack/react-query";
 import { useContext, useEffect } from "react";
-import { processMsgType } from "../utils/processMsg";
+import { msgPageType } from "../queryHooks/useMsgQuery";
 import { statusChangeWebsocketMsg } from "../utils/websocketMsg";
 import AuthContext from "../context/Auth";
 import getMsgStatus from "../utils/extractMsgStatus";
@@ -8,7 +8,7 @@ import { SendJsonMessage } from "react-use-websocket/dist/lib/types";
 import { ReadyState } from "react-use-websocket";
 
 export default function useMsgSeenEffect(
-  chatMessages: InfiniteData<processMsgType[], unknown> | undefined,
+  chatMessages: InfiniteData<msgPageType, unknown> | undefined,
   isConnected: boolean,
   sendJsonMessage: SendJsonMessage,
   socketState: ReadyState,
@@ -20,7 +20,7 @@ export default function useMsgSeenEffect(
     if (chatMessages === undefined || !isConnected) return;
 
     const { unSeenMsg, senderIdList } = getMsgStatus(
-      chatMessages?.pages.flat(),
+      chatMessages?.pages.flatMap((page) => page.messages),
       "seen"
     );
     if (senderIdList.size === 1 && senderIdList.has(context?.user?.id)) return;
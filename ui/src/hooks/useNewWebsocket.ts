@@ -1,6 +1,6 @@
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import useWebSocket, { Options } from "react-use-websocket";
-import { websocketResponseType } from "../types/fetchTypes";
+import { messageType, websocketResponseType } from "../types/fetchTypes";
 import { useUpdateEffect } from "./useUpdateEffect";
 import { SendJsonMessage } from "react-use-websocket/dist/lib/types";
 
@@ -11,6 +11,8 @@ type Props = {
     sendJsonMessage: SendJsonMessage
   ) => void;
   options?: Options;
+  // resume from the last committed watermark of the room when reconnecting
+  resumable?: boolean;
 };
 
 const BaseWebsocketUrl = "ws://ec2-52-73-151-151.compute-1.amazonaws.com/ws";
@@ -19,15 +21,30 @@ export default function useNewWebsocket({
   url,
   onMessage,
   options = {},
+  resumable = false,
 }: Props) {
   const [isConnected, setIsConnected] = useState(false);
   const [reconnectAttempts, setReconnectAttempts] = useState(0);
+  // every message up to lastSeq was received, received holds the ones above it
+  const lastSeq = useRef<number | null>(null);
+  const received = useRef<Set<number>>(new Set());
   const maxRetries = 3;
 
+  useEffect(() => {
+    lastSeq.current = null;
+    received.current = new Set();
+  }, [url]);
+
   const socket = useWebSocket<websocketResponseType>(BaseWebsocketUrl + url, {
     onOpen: () => {
       const token = localStorage.getItem("access");
-      socket.sendMessage(token ? token : "invalid");
+      if (token && resumable && lastSeq.current !== null) {
+        socket.sendMessage(
+          JSON.stringify({ token: token, resume_from: lastSeq.current })
+        );
+      } else {
+        socket.sendMessage(token ? token : "invalid");
+      }
       if (token) setIsConnected(true);
     },
     retryOnError: true,
@@ -51,6 +68,37 @@ export default function useNewWebsocket({
 
   useUpdateEffect(() => {
     if (socket.lastJsonMessage === null) return;
+    if (socket.lastJsonMessage.event_type === "ping") {
+      socket.sendMessage("pong");
+      return;
+    }
+    const { event_type, data, committed } = socket.lastJsonMessage;
+    if (
+      resumable &&
+      (event_type === "new_message" || event_type === "message_backlog")
+    ) {
+      // messages can arrive out of seq order and a resume may replay some again
+      const fresh = (data as messageType[]).filter(
+        (msg) =>
+          msg.seq == null ||
+          (msg.seq > (lastSeq.current ?? 0) && !received.current.has(msg.seq))
+      );
+      fresh.forEach((msg) => {
+        if (msg.seq != null) received.current.add(msg.seq);
+      });
+      if (committed != null && committed > (lastSeq.current ?? 0)) {
+        lastSeq.current = committed;
+        received.current.forEach((seq) => {
+          if (seq <= committed) received.current.delete(seq);
+        });
+      }
+      if (fresh.length === 0) return;
+      onMessage(
+        { ...socket.lastJsonMessage, data: fresh },
+        socket.sendJsonMessage
+      );
+      return;
+    }
     onMessage(socket.lastJsonMessage, socket.sendJsonMessage);
   }, [socket.lastJsonMessage]);
 
@@ -4,18 +4,24 @@ import AuthContext from "../context/Auth";
 import { useChatHistoryQueryMutation } from "../queryHooks/useChatHistoryQuery";
 import { useMsgQueryMutation } from "../queryHooks/useMsgQuery";
 import { useNotificationMutation } from "../queryHooks/useNotificationQuery";
-import { websocketResponseType, messageType } from "../types/fetchTypes";
+import {
+  websocketResponseType,
+  messageType,
+  receiptType,
+} from "../types/fetchTypes";
 import { statusChangeWebsocketMsg } from "../utils/websocketMsg";
 import { excludeFriendsFromUser } from "../utils/extractData";
 import { SendJsonMessage } from "react-use-websocket/dist/lib/types";
 import { notificationType } from "../types/fetchTypes";
 import { useQueryClient } from "@tanstack/react-query";
 import { KEY as addFriendQueryKey } from "../queryHooks/useAddFriendQuery";
+import { KEY as onlineUserQueryKey } from "../queryHooks/useOnlineUserQuery";
 
 export default function useOnMessageMain() {
-  const { updateHistoryData, updateHistoryDataStatus } =
+  const { updateHistoryData, updateHistoryDataStatus, updateHistoryReceipt } =
     useChatHistoryQueryMutation();
-  const { updateMsg, updateMsgStatus } = useMsgQueryMutation();
+  const { updateMsg, updateMsgStatus, updateMsgReceipt } =
+    useMsgQueryMutation();
   const { notificationUpdate } = useNotificationMutation();
   const context = useContext(AuthContext);
   const queryClient = useQueryClient();
@@ -49,6 +55,14 @@ export default function useOnMessageMain() {
         updateHistoryDataStatus(changeMsgData);
         updateMsgStatus(changeMsgData);
         break;
+      case "message_receipt":
+        const receipt = msg.data[0] as receiptType;
+        updateHistoryReceipt(receipt, context?.user?.id);
+        updateMsgReceipt(receipt);
+        break;
+      case "presence":
+        queryClient.invalidateQueries({ queryKey: onlineUserQueryKey });
+        break;
       case "notification":
         const notificationData = msg.data as notificationType[];
         notificationUpdate({
@@ -1,11 +1,19 @@
+import { useContext } from "react";
+import AuthContext from "../context/Auth";
 import { useChatHistoryQueryMutation } from "../queryHooks/useChatHistoryQuery";
 import { useMsgQueryMutation } from "../queryHooks/useMsgQuery";
-import { messageType, websocketResponseType } from "../types/fetchTypes";
+import {
+  messageType,
+  receiptType,
+  websocketResponseType,
+} from "../types/fetchTypes";
 
 export default function useOnMessageRoom() {
-  const { updateHistoryData, updateHistoryDataStatus } =
+  const { updateHistoryData, updateHistoryDataStatus, updateHistoryReceipt } =
     useChatHistoryQueryMutation();
-  const { updateMsg, updateMsgStatus } = useMsgQueryMutation();
+  const { updateMsg, updateMsgStatus, updateMsgReceipt, resetMsg } =
+    useMsgQueryMutation();
+  const context = useContext(AuthContext);
 
   const onMessage = (msg: websocketResponseType) => {
     console.log(msg);
@@ -21,6 +29,19 @@ export default function useOnMessageRoom() {
         updateHistoryDataStatus(msgDataList);
         updateMsgStatus(msgDataList);
         break;
+      case "message_receipt":
+        const receipt = msg.data[0] as receiptType;
+        updateHistoryReceipt(receipt, context?.user?.id);
+        updateMsgReceipt(receipt);
+        break;
+      case "message_backlog":
+        const backlog = msg.data as messageType[];
+        backlog.forEach((m) => updateMsg(m));
+        if (backlog.length) updateHistoryData(backlog[backlog.length - 1]);
+        break;
+      case "resync":
+        if (msg.room_id) resetMsg(msg.room_id);
+        break;
     }
   };
 
@@ -17,28 +17,33 @@ export type searchFriendTypes = Omit<
   friend_status: "none" | "friend" | "requested" | "blocked" | "requested_by";
 };
 
+type searchPageType = {
+  users: searchFriendTypes[];
+  nextCursor: string | null;
+};
+
 export default function useAddFriendQuery(type: string, search: string) {
   const api = useAxios();
 
   return useInfiniteQuery({
     queryKey: [KEY, type, search],
-    queryFn: async ({ queryKey, pageParam }): Promise<searchFriendTypes[]> => {
+    queryFn: async ({ queryKey, pageParam }): Promise<searchPageType> => {
       const [_, type, search] = queryKey;
       const fetch = await api.get(
         userUrl.searchUser({
           searchType: type,
           search,
           limit: LIMIT,
-          offset: pageParam,
+          cursor: pageParam,
         })
       );
-      return fetch.data;
-    },
-    initialPageParam: 0,
-    getNextPageParam: (lastPage, _, lastPageParam) => {
-      if (lastPage.length < 10) return undefined;
-      return lastPageParam + LIMIT;
+      return {
+        users: fetch.data,
+        nextCursor: fetch.headers["x-next-cursor"] ?? null,
+      };
     },
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor ?? undefined,
     staleTime: 60 * 1000,
     retry: 0,
   });
@@ -1,55 +1,116 @@
-import { useQuery, useQueryClient } from "@tanstack/react-query";
+import {
+  InfiniteData,
+  useInfiniteQuery,
+  useQueryClient,
+} from "@tanstack/react-query";
 import useAxios from "../hooks/useAxios";
-import { chatHistoryType, messageType } from "../types/fetchTypes";
+import {
+  chatHistoryType,
+  messageType,
+  receiptType,
+} from "../types/fetchTypes";
 import { roomUrl } from "../utils/apiurl";
+import { useMemo } from "react";
+import { isCoveredByReceipt } from "../utils/websocketMsg";
 
 const KEY = ["chatHistory"];
 
+type historyPageType = {
+  history: chatHistoryType[];
+  nextCursor: string | null;
+};
+type historyDataType = InfiniteData<historyPageType, string | null>;
+
 export default function useChatHistoryQuery() {
   const api = useAxios();
-  const { data, isSuccess, isLoading, isError, error } = useQuery({
+  const query = useInfiniteQuery({
     queryKey: KEY,
-    queryFn: async () => {
-      const fetch = await api.get(roomUrl.chatHistory);
-      return fetch.data;
+    queryFn: async ({ pageParam }): Promise<historyPageType> => {
+      const fetch = await api.get(roomUrl.chatHistory(pageParam));
+      return {
+        history: fetch.data,
+        nextCursor: fetch.headers["x-next-cursor"] ?? null,
+      };
     },
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor ?? undefined,
   });
+  // a stable array, consumers run effects on it
+  const data = useMemo(
+    () => query.data?.pages.flatMap((page) => page.history),
+    [query.data]
+  );
 
-  return { data, isSuccess, isLoading, isError, error };
+  return {
+    data,
+    isSuccess: query.isSuccess,
+    isLoading: query.isLoading,
+    isError: query.isError,
+    error: query.error,
+    hasNextPage: query.hasNextPage,
+    fetchNextPage: query.fetchNextPage,
+    isFetchingNextPage: query.isFetchingNextPage,
+  };
+}
+
+// applies fn to the loaded history of every page, keeps prev when nothing changed
+function mapHistory(
+  prev: historyDataType | undefined,
+  fn: (history: chatHistoryType) => boolean
+) {
+  if (prev === undefined) return prev;
+  let update = false;
+  const pages = prev.pages.map((page) => {
+    const history = structuredClone(page.history);
+    history.forEach((chat) => {
+      if (fn(chat)) update = true;
+    });
+    return { ...page, history };
+  });
+  return update ? { ...prev, pages } : prev;
 }
 
 export function useChatHistoryQueryMutation() {
   const queryClient = useQueryClient();
 
   const updateHistoryData = (msg: messageType) => {
-    queryClient.setQueryData(KEY, (prev: chatHistoryType[]) => {
-      let historyList = structuredClone(prev);
-
-      historyList.forEach((history, index) => {
-        if (history.room.id == msg.room_id) {
-          history.message = msg;
-
-          if (msg.status !== "seen") {
-            history.quantity += 1;
-          }
-          const data = historyList.splice(index, 1)[0];
-          historyList.unshift(data);
+    const prev = queryClient.getQueryData<historyDataType>(KEY);
+    if (prev === undefined) return;
+    const found = prev.pages.some((page) =>
+      page.history.some((history) => history.room.id == msg.room_id)
+    );
+    if (!found) {
+      // the room is on a page not loaded yet, it belongs on top now
+      queryClient.invalidateQueries({ queryKey: KEY });
+      return;
+    }
 
-          return;
-        }
-      });
+    queryClient.setQueryData(KEY, (prev: historyDataType) => {
+      let moved: chatHistoryType | undefined;
+      const pages = prev.pages.map((page) => ({
+        ...page,
+        history: page.history.filter((history) => {
+          if (history.room.id != msg.room_id) return true;
+          moved = structuredClone(history);
+          return false;
+        }),
+      }));
+      if (moved === undefined) return prev;
 
-      return historyList;
+      moved.message = msg;
+      if (msg.status !== "seen") {
+        moved.quantity += 1;
+      }
+      pages[0] = { ...pages[0], history: [moved, ...pages[0].history] };
+      return { ...prev, pages };
     });
   };
 
   const updateHistoryDataStatus = (msg: messageType[]) => {
-    queryClient.setQueryData(KEY, (prev: chatHistoryType[]) => {
-      let historyList = structuredClone(prev);
-      let update = false;
-
-      historyList.forEach((history) => {
-        if (history.message == null) return;
+    queryClient.setQueryData(KEY, (prev: historyDataType) =>
+      mapHistory(prev, (history) => {
+        if (history.message == null) return false;
+        let update = false;
         msg.forEach((m) => {
           if (m.id == history.message.id) {
             history.message = m;
@@ -59,13 +120,29 @@ export function useChatHistoryQueryMutation() {
             update = true;
           }
         });
-      });
-      if (update) {
-        return historyList;
-      }
-      return prev;
-    });
+        return update;
+      })
+    );
+  };
+
+  const updateHistoryReceipt = (receipt: receiptType, userId?: number) => {
+    queryClient.setQueryData(KEY, (prev: historyDataType) =>
+      mapHistory(prev, (history) => {
+        if (history.room.id != receipt.room_id) return false;
+        if (receipt.reader_id === userId && receipt.status == "seen") {
+          history.quantity = 0;
+        }
+        const msg = history.message;
+        if (
+          msg != null &&
+          isCoveredByReceipt(receipt, msg.id, msg.sender_id, msg.status)
+        ) {
+          msg.status = receipt.status;
+        }
+        return true;
+      })
+    );
   };
 
-  return { updateHistoryData, updateHistoryDataStatus };
+  return { updateHistoryData, updateHistoryDataStatus, updateHistoryReceipt };
 }
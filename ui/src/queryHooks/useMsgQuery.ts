@@ -10,11 +10,17 @@ import processMsg, {
   addToProcessMsg,
   processMsgType,
 } from "../utils/processMsg";
-import { messageType } from "../types/fetchTypes";
+import { messageType, receiptType } from "../types/fetchTypes";
 import { messageUrl } from "../utils/apiurl";
+import { isCoveredByReceipt } from "../utils/websocketMsg";
+
+export type msgPageType = {
+  messages: processMsgType[];
+  nextCursor: string | null;
+};
 
 export type useMsgQueryType = InfiniteQueryObserverResult<
-  InfiniteData<processMsgType[], unknown>
+  InfiniteData<msgPageType, unknown>
 > & {
   orderedChatMessages: processMsgType[] | undefined;
 };
@@ -27,27 +33,29 @@ export default function useMsgQuery(roomId: string | undefined) {
 
   const msgQuery = useInfiniteQuery({
     queryKey: [KEY, roomId],
-    queryFn: async ({ pageParam }): Promise<processMsgType[]> => {
+    queryFn: async ({ pageParam }): Promise<msgPageType> => {
       const fetch = await api.get(
-        messageUrl.roomMessage(roomId, pageParam, LIMIT)
+        messageUrl.roomHistory(roomId, pageParam, LIMIT)
       );
       if (fetch.status !== 200) {
         return fetch.data;
       }
-      return processMsg(fetch.data);
-    },
-    initialPageParam: 0,
-    getNextPageParam: (lastPage, _, lastPageParam) => {
-      if (lastPage.reduce((prev, msg) => prev + msg.message.length, 0) < 10)
-        return undefined;
-      return lastPageParam + LIMIT;
+      return {
+        messages: processMsg(fetch.data.messages),
+        nextCursor: fetch.data.next_cursor,
+      };
     },
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor ?? undefined,
     staleTime: 5 * 60 * 1000,
 
     gcTime: 30 * 60 * 1000, // Cache unused data for 30 minutes
   });
   const orderedChatMessages = useMemo(
-    () => structuredClone(msgQuery.data?.pages)?.reverse().flat(),
+    () =>
+      structuredClone(msgQuery.data?.pages)
+        ?.reverse()
+        .flatMap((page) => page.messages),
     [msgQuery.data]
   );
 
@@ -64,12 +72,20 @@ export function useMsgQueryMutation() {
     if (queryClient.getQueryData([KEY, msg.room_id]) === undefined) return;
     queryClient.setQueryData(
       [KEY, msg.room_id],
-      (prev: InfiniteData<processMsgType[], unknown>) => ({
-        pages: [addToProcessMsg(prev.pages.shift(), msg), ...prev.pages],
-        pageParams: prev.pageParams.map((param, i, arr) =>
-          i === arr.length - 1 ? Number(param) + 1 : param
-        ),
-      })
+      (prev: InfiniteData<msgPageType, unknown>) => {
+        const [latest, ...older] = prev.pages;
+        return {
+          // cursors point at fixed messages, new ones never shift the pages
+          pages: [
+            {
+              ...latest,
+              messages: addToProcessMsg(latest.messages, msg) ?? latest.messages,
+            },
+            ...older,
+          ],
+          pageParams: prev.pageParams,
+        };
+      }
     );
   };
 
@@ -77,9 +93,9 @@ export function useMsgQueryMutation() {
     if (queryClient.getQueryData([KEY, msg[0].room_id]) === undefined) return;
     queryClient.setQueryData(
       [KEY, msg[0].room_id],
-      (prev: InfiniteData<processMsgType[], unknown>) => {
+      (prev: InfiniteData<msgPageType, unknown>) => {
         let newMsg = structuredClone(prev);
-        newMsg.pages.flat().forEach((msgBlock) => {
+        newMsg.pages.flatMap((page) => page.messages).forEach((msgBlock) => {
           msgBlock.message.forEach((m) => {
             msg.forEach((recievedmsg) => {
               if (m.id == recievedmsg.id) {
@@ -93,5 +109,27 @@ export function useMsgQueryMutation() {
     );
   };
 
-  return { updateMsg, updateMsgStatus };
+  const updateMsgReceipt = (receipt: receiptType) => {
+    if (queryClient.getQueryData([KEY, receipt.room_id]) === undefined) return;
+    queryClient.setQueryData(
+      [KEY, receipt.room_id],
+      (prev: InfiniteData<msgPageType, unknown>) => {
+        let newMsg = structuredClone(prev);
+        newMsg.pages.flatMap((page) => page.messages).forEach((msgBlock) => {
+          msgBlock.message.forEach((m) => {
+            if (isCoveredByReceipt(receipt, m.id, msgBlock.sender_id, m.status)) {
+              m.status = receipt.status;
+            }
+          });
+        });
+        return newMsg;
+      }
+    );
+  };
+
+  const resetMsg = (roomId: string) => {
+    queryClient.invalidateQueries({ queryKey: [KEY, roomId] });
+  };
+
+  return { updateMsg, updateMsgStatus, updateMsgReceipt, resetMsg };
 }
@@ -2,7 +2,7 @@ import { useQuery } from "@tanstack/react-query";
 import useAxios from "../hooks/useAxios";
 import { userUrl } from "../utils/apiurl";
 
-const KEY = ["onlineUsers"];
+export const KEY = ["onlineUsers"];
 
 export default function useOnlineUserQuery() {
   const api = useAxios();
@@ -68,12 +68,38 @@ export type messageType = {
   file_links: string[] | null;
   status: msgStatusType;
   seen_by: number[];
+  seq?: number | null;
+};
+
+export type receiptType = {
+  room_id: string;
+  reader_id: number;
+  status: msgStatusType;
+  up_to: string;
+};
+
+export type presenceType = {
+  user_id: number;
+  is_online: boolean;
+  last_seen: number | null;
 };
 
 export type websocketResponseType = {
-  event_type: "new_message" | "change_message_status" | "notification";
-  data: messageType[] | notificationType[];
+  event_type:
+    | "new_message"
+    | "change_message_status"
+    | "message_receipt"
+    | "notification"
+    | "presence"
+    | "ping"
+    | "slow_down"
+    | "message_backlog"
+    | "resync";
+  data: messageType[] | notificationType[] | receiptType[] | presenceType[];
   sender_user: userType;
+  room_id?: string;
+  // committed watermark of the room on message events
+  committed?: number | null;
 };
 
 type notificationEnumType =
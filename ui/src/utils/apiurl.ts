@@ -16,12 +16,20 @@ export const messageTag = "message";
 export const messageUrl = {
   roomMessage: (roomId: string | undefined, offset: number, limit: number) =>
     `/${baseTag}/${messageTag}/msg/${roomId}/?offset=${offset}&limit=${limit}`,
+  roomHistory: (
+    roomId: string | undefined,
+    cursor: string | null,
+    limit: number
+  ) =>
+    `/${baseTag}/${messageTag}/history/${roomId}/?limit=${limit}` +
+    (cursor ? `&before=${cursor}` : ""),
 };
 
 export const roomTag = "room";
 export const roomUrl = {
   getRoom: `/${baseTag}/${roomTag}/`,
-  chatHistory: `/${baseTag}/${roomTag}/history/`,
+  chatHistory: (cursor: string | null) =>
+    `/${baseTag}/${roomTag}/history/` + (cursor ? `?cursor=${cursor}` : ""),
   initialRoom: `/${baseTag}/${roomTag}/initialRoom/`,
 
   getRoomById: (roomId: string | undefined) =>
@@ -36,7 +44,7 @@ type searchUser = {
   searchType: string;
   search: string;
   limit: number;
-  offset: number;
+  cursor: string | null;
 };
 export const userUrl = {
   getUser: (uid?: string, user_id?: number) => {
@@ -56,7 +64,8 @@ export const userUrl = {
   deleteUser: `/${baseTag}/${userTag}/deleteuser/`,
 
   searchUser: (query: searchUser) =>
-    `/${baseTag}/${userTag}/search/?search_type=${query.searchType}&search=${query.search}&limit=${query.limit}&offset=${query.offset}`,
+    `/${baseTag}/${userTag}/search/?search_type=${query.searchType}&search=${encodeURIComponent(query.search)}&limit=${query.limit}` +
+    (query.cursor ? `&cursor=${query.cursor}` : ""),
   onlineUser: `/${baseTag}/${userTag}/onlineuser/`,
 };
 
@@ -1,4 +1,4 @@
-import { userType } from "../types/fetchTypes";
+import { msgStatusType, receiptType, userType } from "../types/fetchTypes";
 import { excludeFriendsFromUser } from "./extractData";
 import { processMsgType } from "./processMsg";
 
@@ -46,3 +46,24 @@ export function statusChangeWebsocketMsg({
     sender_user: excludeFriendsFromUser(sender_user),
   };
 }
+
+const msgStatusRank: Record<msgStatusType, number> = {
+  sent: 0,
+  delivered: 1,
+  seen: 2,
+};
+
+// a receipt covers every message of the room up to receipt.up_to not sent by the
+// reader, object ids of the same length sort in creation order
+export function isCoveredByReceipt(
+  receipt: receiptType,
+  msgId: string,
+  senderId: number,
+  status: msgStatusType
+) {
+  return (
+    senderId !== receipt.reader_id &&
+    msgId <= receipt.up_to &&
+    msgStatusRank[status] < msgStatusRank[receipt.status]
+  );
+}